@@ -5,17 +5,37 @@ Python Flask Application - Port 5000
 This is the core agent engine that executes pre/post hooks for LLM tool invocations.
 """
 
-from flask import Flask, request, jsonify
+# Measured from the top so dependency imports count toward cold start
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, request, jsonify, g, has_app_context
 from flask_cors import CORS
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.pool
+from psycopg2.extras import RealDictCursor, execute_values
 import json
 import re
 from datetime import datetime
 from typing import Dict, List, Any, Tuple
 import os
+import hashlib
+import heapq
+import http.client
+import itertools
+import math
+import numpy as np
+import queue
+import select
+import sys
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from decimal import Decimal
+from urllib.parse import urlencode, urlsplit
 from flask.json.provider import DefaultJSONProvider
+from werkzeug.serving import is_running_from_reloader
 
 
 
@@ -35,10 +55,197 @@ DB_CONFIG = {
 }
 
 
-def get_db_connection():
-    """Get PostgreSQL database connection"""
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+CACHE_INVALIDATION_CHANNEL = 'guardrails_table_changes'
+AUDIT_METADATA_MAX_BYTES = int(os.getenv('AUDIT_METADATA_MAX_BYTES', '8192'))
+ADMISSION_LIMITS = {
+    # Per user_id token bucket: sustained requests/second and burst size
+    'user_rate': float(os.getenv('ADMISSION_USER_RATE', '2')),
+    'user_burst': float(os.getenv('ADMISSION_USER_BURST', '10')),
+    # Per role token bucket shared by every user of the role: [rate, burst]
+    'role_limits': json.loads(os.getenv(
+        'ADMISSION_ROLE_LIMITS',
+        '{"admin": [50, 100], "manager": [20, 40], "employee": [20, 40]}'
+    )),
+    # Concurrent tool executions, and how many may wait (and for how long)
+    'max_concurrency': int(os.getenv('ADMISSION_MAX_CONCURRENCY', '16')),
+    'max_queue': int(os.getenv('ADMISSION_MAX_QUEUE', '64')),
+    'queue_timeout': float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '2'))
+}
+WEB_SEARCH_CONFIG = {
+    # 'mock' returns canned results; 'http' calls WEB_SEARCH_URL
+    'backend': os.getenv('WEB_SEARCH_BACKEND', 'mock'),
+    'url': os.getenv('WEB_SEARCH_URL', 'http://localhost:5050/search'),
+    'timeout': float(os.getenv('WEB_SEARCH_TIMEOUT', '3')),
+    'pool_size': int(os.getenv('WEB_SEARCH_POOL_SIZE', '8')),
+    'cache_ttl': float(os.getenv('WEB_SEARCH_CACHE_TTL', '300')),
+    'cache_size': int(os.getenv('WEB_SEARCH_CACHE_SIZE', '1000')),
+    'breaker_threshold': int(os.getenv('WEB_SEARCH_BREAKER_THRESHOLD', '5')),
+    'breaker_cooldown': float(os.getenv('WEB_SEARCH_BREAKER_COOLDOWN', '30'))
+}
+# A tool execution holds at most one connection; the headroom covers user
+# lookups and audit inserts made outside the admission slot
+DB_POOL_HEADROOM = int(os.getenv('DB_POOL_HEADROOM', '8'))
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '2'))
+DB_POOL_MAX = int(os.getenv(
+    'DB_POOL_MAX', str(ADMISSION_LIMITS['max_concurrency'] + DB_POOL_HEADROOM)
+))
+# How long a request may wait for a pooled connection before it is shed
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '2'))
+SHED_AUDIT_QUEUE_SIZE = int(os.getenv('SHED_AUDIT_QUEUE_SIZE', '10000'))
+SHED_AUDIT_BATCH_SIZE = int(os.getenv('SHED_AUDIT_BATCH_SIZE', '500'))
+
+AUDIT_INSERT_COLUMNS = """
+    INSERT INTO audit_log
+    (user_id, username, query, tool_invoked, hooks_triggered, action_taken,
+     data_masked, blocked, risk_score, response_summary, metadata)
+"""
+
+# Statements every request path runs: name -> (parameter types, SQL).
+# Each pooled connection PREPAREs them once; call sites EXECUTE them by name
+HOT_STATEMENTS = {
+    'user_by_id': ('integer', "SELECT * FROM users WHERE id = $1"),
+    'employee_department': ('integer', "SELECT department FROM employees WHERE id = $1"),
+    'department_average': ('text', """
+        SELECT department, AVG(salary) as avg_salary, COUNT(*) as count
+        FROM employees
+        WHERE department = $1
+        GROUP BY department
+    """),
+    'employees_above_salary': ('numeric', """
+        SELECT id, name, email, department, role, salary
+        FROM employees
+        WHERE salary > $1
+        ORDER BY department, salary DESC
+    """),
+    'all_employees': ('', """
+        SELECT id, name, email, department, role, salary
+        FROM employees
+        ORDER BY department, salary DESC
+    """),
+    'insert_audit_event': (
+        'integer, varchar, text, varchar, text[], varchar, boolean, boolean, integer, text, jsonb',
+        AUDIT_INSERT_COLUMNS + """
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+        RETURNING id
+    """),
+}
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Pool connection that knows whether HOT_STATEMENTS are prepared on it"""
+    statements_prepared = False
+
+
+def prepare_hot_statements(conn):
+    """PREPARE every HOT_STATEMENTS entry for this session"""
+    cur = conn.cursor()
+    for name, (types, statement) in HOT_STATEMENTS.items():
+        signature = f" ({types})" if types else ""
+        cur.execute(f"PREPARE {name}{signature} AS {statement}")
+    cur.close()
+    conn.commit()
+    conn.statements_prepared = True
+
+
+def execute_prepared(cur, name: str, params: Tuple = ()):
+    """EXECUTE a HOT_STATEMENTS entry on a pooled connection's cursor"""
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises when exhausted; this makes callers wait instead
+_db_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+
+class DatabaseBusyError(Exception):
+    """No pooled connection became free within DB_POOL_TIMEOUT"""
+
+
+def init_db_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """Create the connection pool (opening DB_POOL_MIN connections) once"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX, **DB_CONFIG,
+                    connection_factory=PreparingConnection, cursor_factory=RealDictCursor
+                )
+    return _db_pool
+
+
+def open_db_connection():
+    """Open a dedicated (unpooled) connection for long-lived or forked use"""
     return psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
 
+
+def get_db_connection():
+    """Get PostgreSQL database connection from the pool, waiting up to DB_POOL_TIMEOUT"""
+    if not _db_pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise DatabaseBusyError(f"No database connection free after {DB_POOL_TIMEOUT}s")
+    try:
+        conn = init_db_pool().getconn()
+    except Exception:
+        _db_pool_slots.release()
+        raise
+    if has_app_context():
+        g.setdefault('db_connections', []).append(conn)
+
+    # New (or replaced) pool connections prepare on first checkout
+    if not conn.statements_prepared:
+        try:
+            prepare_hot_statements(conn)
+        except Exception:
+            release_db_connection(conn)
+            raise
+    return conn
+
+
+def release_db_connection(conn):
+    """Return a pooled connection, ending any open read transaction"""
+    if has_app_context() and conn in g.get('db_connections', ()):
+        g.db_connections.remove(conn)
+
+    broken = bool(conn.closed)
+    if not broken:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+    try:
+        _db_pool.putconn(conn, close=broken)
+    finally:
+        _db_pool_slots.release()
+
+
+@contextmanager
+def db_connection():
+    """
+    Pooled connection that is always given back, also when the body raises
+    (broken connections are discarded). Use this outside request contexts
+    too: background threads have no teardown hook to clean up after them.
+    """
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        release_db_connection(conn)
+
+
+@app.teardown_appcontext
+def release_leaked_connections(exc):
+    """Connections left checked out by a failed request are discarded"""
+    for conn in g.pop('db_connections', []):
+        try:
+            _db_pool.putconn(conn, close=True)
+        finally:
+            _db_pool_slots.release()
+
 # ============================================================================
 # GUARDRAIL RULE ENGINE
 # ============================================================================
@@ -56,6 +263,9 @@ from decimal import Decimal
 
 def serialize_decimals(obj):
     
+    if isinstance(obj, ColumnarResultSet):
+        return obj.to_rows()
+
     if isinstance(obj, Decimal):
         return float(obj)
 
@@ -71,29 +281,245 @@ def serialize_decimals(obj):
     return obj
 
 
+SALARY_THRESHOLD_PATTERN = re.compile(r'over\s*\$?(\d+)')
+SALARY_VALUE_PATTERN = re.compile(r'\$?\d+[,.]?\d*k?')
+
 def extract_salary_threshold(query: str):
-    match = re.search(r'over\s*\$?(\d+)', query.lower())
+    match = SALARY_THRESHOLD_PATTERN.search(query.lower())
     if match:
         return int(match.group(1)) * 1000
     return None
 
 # trial ends
 
+def parse_query_intent(query_intent: str) -> Tuple:
+    """Reduce a natural-language query to the structured intent database_query runs"""
+    if "average" in query_intent.lower():
+        return ('department_average',)
+    return ('employee_list', extract_salary_threshold(query_intent))
+
+# Default risk weight per rule action, overridable with config.risk_weight
+RISK_WEIGHTS = {'block': 90, 'require_approval': 80, 'mask': 40, 'filter': 30}
+HARD_ACTIONS = ('block', 'require_approval')
+
+
+def combine_risk(scores) -> int:
+    """Combine independent risk scores (0-100) as a noisy-OR"""
+    scores = np.minimum(np.maximum(np.asarray(scores, dtype=np.float64), 0.0), 100.0)
+    return int(round(100 * (1.0 - np.prod(1.0 - scores / 100.0))))
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick matcher over a fixed keyword list.
+
+    One pass over the text finds every keyword occurring as a substring
+    (the same semantics as `keyword in text`), so the cost follows the query
+    length rather than the number of keywords.
+    """
+
+    def __init__(self, keywords: List[str]):
+        goto = [{}]
+        outputs = [[]]
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(index)
+
+        # Breadth-first, so a state's failure target is final before its children
+        fail = [0] * len(goto)
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, nxt in goto[state].items():
+                pending.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                outputs[nxt].extend(outputs[fail[nxt]])
+
+        self.goto = goto
+        self.fail = fail
+        self.outputs = [tuple(o) for o in outputs]
+
+    def find(self, text: str) -> List[int]:
+        """Indices of keywords occurring in text (may repeat)"""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        state = 0
+        found = []
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if outputs[state]:
+                found.extend(outputs[state])
+        return found
+
+
+class RiskScoringEngine:
+    """
+    Evaluates every pre-hook rule against a query in one vectorized pass.
+
+    Rules are compiled into a boolean rule-by-feature matrix whose columns are
+    the trigger keywords followed by the trigger tools. A query only activates
+    a handful of features, so scoring gathers those columns and reduces them
+    per rule instead of looping over the rules in Python.
+    """
+
+    def __init__(self, rules: List[Dict]):
+        # Rules arrive ordered by priority; row order preserves it
+        self.rules = rules
+        self.rule_names = np.array([rule["rule_name"] for rule in rules], dtype=object)
+
+        keywords = {}
+        tools = {}
+        for rule in rules:
+            trigger = rule.get("trigger_condition") or {}
+            for k in trigger.get("keywords", []):
+                keywords.setdefault(k.lower(), len(keywords))
+            for t in trigger.get("tools", []):
+                tools.setdefault(t, len(tools))
+
+        self.keywords = list(keywords)
+        self.keyword_matcher = KeywordAutomaton(self.keywords)
+        self.tool_columns = {t: len(keywords) + i for t, i in tools.items()}
+        self.num_keywords = len(keywords)
+
+        # Column-major so gathering a feature column is a contiguous copy
+        matrix = np.zeros((len(rules), len(keywords) + len(tools)), dtype=bool, order='F')
+        weights = np.zeros(len(rules), dtype=np.float64)
+        hard = np.zeros(len(rules), dtype=bool)
+
+        for row, rule in enumerate(rules):
+            trigger = rule.get("trigger_condition") or {}
+            for k in trigger.get("keywords", []):
+                matrix[row, keywords[k.lower()]] = True
+            for t in trigger.get("tools", []):
+                matrix[row, self.tool_columns[t]] = True
+
+            config = rule.get("config") or {}
+            weights[row] = config.get("risk_weight", RISK_WEIGHTS.get(rule["action"], 0))
+            hard[row] = rule["action"] in HARD_ACTIONS
+
+        self.matrix = matrix
+        self.weights = weights
+        self.hard = hard
+        self.requires_tool = matrix[:, self.num_keywords:].any(axis=1)
+
+    def extract_features(self, query: str, tools: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the active keyword and tool column indices for a query"""
+        keyword_cols = self.keyword_matcher.find(query.lower())
+        tool_cols = [self.tool_columns[t] for t in tools if t in self.tool_columns]
+        return (np.array(keyword_cols, dtype=np.intp),
+                np.array(tool_cols, dtype=np.intp))
+
+    def score(self, keyword_cols: np.ndarray, tool_cols: np.ndarray) -> np.ndarray:
+        """Boolean vector of rules whose keyword and tool triggers both match"""
+        keyword_hit = self.matrix[:, keyword_cols].any(axis=1)
+        tool_hit = ~self.requires_tool | self.matrix[:, tool_cols].any(axis=1)
+        return keyword_hit & tool_hit
+
+    def evaluate(self, query: str, tools: List[str]) -> Dict:
+        """
+        Score a query against every rule.
+
+        Returns:
+            {
+                "fired": [rule_name],     # priority order
+                "contributions": {rule_name: weight},
+                "risk_score": int,        # combined over all fired rules
+                "hard_rule": rule or None # highest priority block/approval
+            }
+        """
+        fired = np.flatnonzero(self.score(*self.extract_features(query, tools)))
+        hard_fired = fired[self.hard[fired]]
+        weights = self.weights[fired]
+        names = self.rule_names[fired].tolist()
+
+        return {
+            "fired": names,
+            "contributions": dict(zip(names, weights.astype(int).tolist())),
+            "risk_score": combine_risk(weights),
+            "hard_rule": self.rules[hard_fired[0]] if len(hard_fired) else None
+        }
+
+
 class GuardrailEngine:
     """Core engine for executing guardrail rules"""
     
-    def __init__(self):
+    def __init__(self, rules: List[Dict] = None):
+        # A fixed rule set (e.g. a replay candidate) replaces the database lookup
+        self.static_rules = rules
         self.sensitive_keywords = [
             'salary', 'compensation', 'pay', 'wages', 'bonus',
             'ssn', 'social security', 'personal', 'confidential'
         ]
-        self.employee_name_pattern = r'\b[A-Z][a-z]+ [A-Z][a-z]+\b'
-        
-    def load_active_guardrails(self, user_role: str) -> List[Dict]:
-        """Load active guardrail rules applicable to user's role"""
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
+        self.employee_name_pattern = re.compile(r'\b[A-Z][a-z]+ [A-Z][a-z]+\b')
+        # Lower-cased employee names; None until loaded, reset on employee changes
+        self._employee_names = None
+        # role -> (rule-set version, rules incl. shadow); reset on rule changes
+        self._rule_sets = {}
+        self._rule_sets_generation = 0
+        self._rule_sets_lock = threading.Lock()
+        # role -> (rule-set version, live engine, shadow engine or None)
+        self._scoring_engines = {}
+
+    def load_rule_set(self, user_role: str) -> Tuple[str, List[Dict]]:
+        """
+        Active rules for a role, shadow rules included, with their version.
+
+        Held in memory until invalidate_rules(), so the version fingerprint
+        is computed once per rule change rather than once per request.
+        """
+        cached = self._rule_sets.get(user_role)
+        if cached is not None:
+            return cached
+
+        generation = self._rule_sets_generation
+        if self.static_rules is not None:
+            rules = sorted(
+                (r for r in self.static_rules
+                 if r.get('enabled', True)
+                 and (user_role in r['target_roles'] or 'admin' in r['target_roles'])),
+                key=lambda r: r.get('priority', 100)
+            )
+        else:
+            rules = self._fetch_active_guardrails(user_role)
+
+        cached = (ruleset_version(rules), rules)
+        with self._rule_sets_lock:
+            # Rules fetched before a change notification may already be stale
+            if generation == self._rule_sets_generation:
+                self._rule_sets[user_role] = cached
+        return cached
+
+    def invalidate_rules(self):
+        with self._rule_sets_lock:
+            self._rule_sets_generation += 1
+            self._rule_sets.clear()
+
+    def load_active_guardrails(self, user_role: str, include_shadow: bool = False) -> List[Dict]:
+        """
+        Load active guardrail rules applicable to user's role.
+
+        Shadow rules are only returned when include_shadow is set; they are
+        evaluated for reporting but must never change a response.
+        """
+        rules = self.load_rule_set(user_role)[1]
+
+        if not include_shadow:
+            rules = [r for r in rules if not r.get('shadow')]
+        return rules
+
+    def _fetch_active_guardrails(self, user_role: str) -> List[Dict]:
         # TODO: Implement query to fetch active guardrails
         # - Filter by enabled = true
         # - Filter by target_roles containing user's role
@@ -105,14 +531,45 @@ class GuardrailEngine:
             ORDER BY priority ASC
         """
         
-        cur.execute(query, (user_role,))
-        rules = cur.fetchall()
-        
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(query, (user_role,))
+            rules = cur.fetchall()
+            cur.close()
         
         return [dict(rule) for rule in rules]
     
+    def get_scoring_engines(self, user_role: str) -> Tuple[RiskScoringEngine, RiskScoringEngine]:
+        """Compiled live and shadow (None if none) pre-hook engines for a role"""
+        version, guardrails = self.load_rule_set(user_role)
+        cached = self._scoring_engines.get(user_role)
+        if cached is None or cached[0] != version:
+            pre_hooks, shadow_pre_hooks = self._split_pre_hooks(guardrails)
+            cached = (
+                version,
+                RiskScoringEngine(pre_hooks),
+                RiskScoringEngine(shadow_pre_hooks) if shadow_pre_hooks else None
+            )
+            self._scoring_engines[user_role] = cached
+        return cached[1], cached[2]
+
+    def _split_pre_hooks(self, guardrails: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Separate live and shadow pre-hook rules, keeping priority order"""
+        pre_hooks = [
+            g for g in guardrails
+            if g["rule_type"] == "pre_hook" and not g.get("shadow")
+        ]
+        shadow_pre_hooks = [
+            g for g in guardrails
+            if g["rule_type"] == "pre_hook" and g.get("shadow")
+        ]
+        return pre_hooks, shadow_pre_hooks
+
+    def compile_rule_sets(self, roles: List[str]):
+        """Load and compile the live and shadow pre-hook engines for each role"""
+        for role in roles:
+            self.get_scoring_engines(role)
+
     def execute_pre_hooks(self, query: str, user: Dict, tools: List[str]) -> Dict:
         """
         Execute pre-hooks before tool invocation.
@@ -124,7 +581,9 @@ class GuardrailEngine:
                 "tools_blocked": [str],
                 "hooks_triggered": [str],
                 "reason": str,
-                "risk_score": int
+                "risk_score": int,
+                "risk_contributions": {rule_name: int},
+                "shadow": {...} or None  # shadow rule decision, never enforced
             }
         """
 
@@ -134,52 +593,43 @@ class GuardrailEngine:
             "tools_blocked": [],
             "hooks_triggered": [],
             "reason": "",
-            "risk_score": 0
+            "risk_score": 0,
+            "risk_contributions": {},
+            "shadow": None
         }
 
-        # Load ONLY enabled rules for this role
-        guardrails = self.load_active_guardrails(user["role"])
+        # Compiled from ONLY enabled rules for this role
+        engine, shadow_engine = self.get_scoring_engines(user["role"])
 
-        pre_hooks = [
-            g for g in guardrails
-            if g["rule_type"] == "pre_hook"
-        ]
-
-        query_lower = query.lower()
-
-        for rule in pre_hooks:
-            trigger = rule["trigger_condition"]
-            keywords = trigger.get("keywords", [])
-            tools_trigger = trigger.get("tools", [])
-
-            keyword_match = keywords and any(k in query_lower for k in keywords)
-            tool_match = not tools_trigger or any(t in tools for t in tools_trigger)
+        if shadow_engine is not None:
+            result["shadow"] = self._evaluate_shadow_pre_hooks(query, tools, shadow_engine)
 
-            if not keyword_match or not tool_match:
-                continue
+        # Score every applicable rule at once; all matches are recorded
+        scoring = engine.evaluate(query, tools)
 
-            result["hooks_triggered"].append(rule["rule_name"])
+        result["hooks_triggered"] = scoring["fired"]
+        result["risk_contributions"] = scoring["contributions"]
+        result["risk_score"] = scoring["risk_score"]
 
-            if rule["action"] == "block":
-                result["allowed"] = False
-                result["reason"] = rule["config"].get(
+        # Hard blocks still short-circuit tool execution
+        hard_rule = scoring["hard_rule"]
+        if hard_rule is not None:
+            result["allowed"] = False
+            if hard_rule["action"] == "block":
+                result["reason"] = hard_rule["config"].get(
                     "error_message",
                     "Access denied"
                 )
-                result["risk_score"] = 90
-                return result
-
-            if rule["action"] == "require_approval":
-                result["allowed"] = False
+            else:
                 result["reason"] = "Requires admin approval"
-                result["risk_score"] = 80
-                return result
+            return result
 
         # Web search leakage = tool blocked, NOT full block
         if "web_search" in tools and self._detect_internal_data(query):
             result["tools_blocked"].append("web_search")
             result["hooks_triggered"].append("prevent_data_leakage_websearch")
-            result["risk_score"] = 95
+            result["risk_contributions"]["prevent_data_leakage_websearch"] = 95
+            result["risk_score"] = combine_risk(list(result["risk_contributions"].values()))
 
         return result
         # Trial
@@ -241,6 +691,22 @@ class GuardrailEngine:
 
 
 
+    def _evaluate_shadow_pre_hooks(self, query: str, tools: List[str],
+                                   engine: RiskScoringEngine) -> Dict:
+        """Evaluate shadow rules on their own and time it; the result is report-only"""
+        started = time.perf_counter()
+        scoring = engine.evaluate(query, tools)
+        hard_rule = scoring["hard_rule"]
+
+        return {
+            "hooks_triggered": scoring["fired"],
+            "risk_contributions": scoring["contributions"],
+            "risk_score": scoring["risk_score"],
+            "would_block": hard_rule is not None,
+            "blocking_rule": hard_rule["rule_name"] if hard_rule else None,
+            "eval_us": round((time.perf_counter() - started) * 1e6, 1)
+        }
+
     def execute_post_hooks(self, response_data: Any, user: Dict, tool_used: str) -> Dict:
         """
         Execute post-hooks after tool invocation
@@ -250,21 +716,29 @@ class GuardrailEngine:
                 "filtered_response": Any,
                 "masked_fields": [str],
                 "aggregated": bool,
-                "hooks_triggered": [str]
+                "hooks_triggered": [str],
+                "shadow_hooks_triggered": [str]
             }
         """
         result = {
             "filtered_response": response_data,
             "masked_fields": [],
             "aggregated": False,
-            "hooks_triggered": []
+            "hooks_triggered": [],
+            "shadow_hooks_triggered": []
         }
         
         # Load applicable guardrails
-        guardrails = self.load_active_guardrails(user['role'])
+        guardrails = self.load_active_guardrails(user['role'], include_shadow=True)
         post_hooks = [g for g in guardrails if g['rule_type'] == 'post_hook']
         
         for hook in post_hooks:
+            if hook.get('shadow'):
+                # Recorded only; shadow hooks never touch the response
+                if hook['action'] in ('mask', 'filter'):
+                    result['shadow_hooks_triggered'].append(hook['rule_name'])
+                continue
+
             # TODO: Implement post-processing logic
             
             if hook['action'] == 'mask':
@@ -306,34 +780,441 @@ class GuardrailEngine:
             return True
         
         # Check for employee names
-        names = re.findall(self.employee_name_pattern, query)
+        names = self.employee_name_pattern.findall(query)
         if names:
             # Verify if these are actual employee names
             return self._verify_employee_names(names)
         
         # Check for salary keywords with specific values
         if any(kw in query.lower() for kw in ['salary', 'compensation', 'pay']):
-            if re.search(r'\$?\d+[,.]?\d*k?', query):
+            if SALARY_VALUE_PATTERN.search(query):
                 return True
         
         return False
     
     def _verify_employee_names(self, names: List[str]) -> bool:
         """Verify if extracted names match employee records"""
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        for name in names:
-            cur.execute("SELECT COUNT(*) as count FROM employees WHERE name ILIKE %s", (name,))
-            result = cur.fetchone()
-            if result['count'] > 0:
-                cur.close()
+        employee_names = self._employee_names
+        if employee_names is None:
+            employee_names = self.load_employee_name_index()
+
+        return any(name.lower() in employee_names for name in names)
+
+    def load_employee_name_index(self) -> frozenset:
+        """Load every employee name (lower-cased) for in-memory lookups"""
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT name FROM employees")
+            employee_names = frozenset(r['name'].lower() for r in cur.fetchall())
+            cur.close()
+
+        self._employee_names = employee_names
+        return employee_names
+
+    def invalidate_employee_name_index(self):
+        self._employee_names = None
+
+# ============================================================================
+# COLUMNAR RESULT SETS
+# ============================================================================
+
+class ColumnarResultSet:
+    """
+    Employee rows held as parallel column arrays plus a selection mask.
+
+    Filtering narrows the selection and salary masking marks rows, both as
+    numpy operations; row dicts are only built by to_rows() at the JSON
+    boundary. Salary is a float64 array, id an int64 array and every other
+    column an object array.
+    """
+
+    NUMERIC_COLUMNS = {'salary': np.float64, 'id': np.int64}
+    # Object cells sized per column when estimating nbytes()
+    OBJECT_SAMPLE_SIZE = 256
+
+    def __init__(self, columns: Dict[str, np.ndarray], selection: np.ndarray = None,
+                 salary_labels: np.ndarray = None, label_bytes: int = 0):
+        self.columns = columns
+        size = len(next(iter(columns.values()))) if columns else 0
+        self.selection = selection if selection is not None else np.ones(size, dtype=bool)
+        # Object array of range labels where salary is masked, None elsewhere
+        self.salary_labels = salary_labels
+        # Bytes held by the objects that object-column cells point at,
+        # estimated once (see compact())
+        self._object_bytes = None
+        # Bytes of the distinct range label strings, added as labels are made
+        self.label_bytes = label_bytes
+
+    @classmethod
+    def from_rows(cls, names: List[str], rows: List[Tuple]) -> 'ColumnarResultSet':
+        values = list(zip(*rows)) if rows else [()] * len(names)
+        columns = {}
+        for name, column in zip(names, values):
+            dtype = cls.NUMERIC_COLUMNS.get(name, object)
+            array = np.empty(len(column), dtype=dtype)
+            array[:] = column
+            columns[name] = array
+        return cls(columns)
+
+    @classmethod
+    def from_cursor(cls, cur) -> 'ColumnarResultSet':
+        """Build from a tuple (non-dict) cursor after execute()"""
+        return cls.from_rows([d[0] for d in cur.description], cur.fetchall())
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.selection))
+
+    def select(self, keep: np.ndarray) -> 'ColumnarResultSet':
+        """Narrow the selection; column arrays are shared, not copied"""
+        return ColumnarResultSet(self.columns, self.selection & keep, self.salary_labels,
+                                 self.label_bytes)
+
+    def mask_salaries(self, maskable: np.ndarray, range_size: int = 20000) -> int:
+        """Replace selected, maskable salaries with range labels; returns count"""
+        masked = self.selection & maskable
+        count = int(np.count_nonzero(masked))
+        if not count:
+            return 0
+
+        lower_k = (np.floor_divide(self.columns['salary'][masked], range_size)
+                   * range_size // 1000).astype(np.int64)
+        step_k = range_size // 1000
+        buckets, inverse = np.unique(lower_k, return_inverse=True)
+        bucket_labels = np.array(
+            [f"${b}k-${b + step_k}k" for b in buckets.tolist()], dtype=object
+        )
+
+        labels = (self.salary_labels.copy() if self.salary_labels is not None
+                  else np.full(len(self.selection), None, dtype=object))
+        labels[masked] = bucket_labels[inverse]
+        self.salary_labels = labels
+        self.label_bytes += sum(map(sys.getsizeof, bucket_labels.tolist()))
+        return count
+
+    def compact(self) -> 'ColumnarResultSet':
+        """Copy out only the selected rows (e.g. before caching); sizes them once"""
+        keep = self.selection
+        compacted = ColumnarResultSet(
+            {name: column[keep] for name, column in self.columns.items()},
+            None,
+            self.salary_labels[keep] if self.salary_labels is not None else None,
+            self.label_bytes
+        )
+        compacted.nbytes()
+        return compacted
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory held: the arrays plus the objects their object
+        cells reference. Fetched strings are one object per cell, sized from
+        an evenly spaced sample of each column; range labels are shared, so
+        each distinct label is counted once.
+        """
+        arrays = [self.selection, *self.columns.values()]
+        if self.salary_labels is not None:
+            arrays.append(self.salary_labels)
+
+        if self._object_bytes is None:
+            self._object_bytes = sum(
+                self._sampled_object_bytes(c)
+                for c in self.columns.values() if c.dtype == object
+            )
+        return sum(a.nbytes for a in arrays) + self._object_bytes + self.label_bytes
+
+    def _sampled_object_bytes(self, column: np.ndarray) -> int:
+        size = len(column)
+        if size <= self.OBJECT_SAMPLE_SIZE:
+            return sum(map(sys.getsizeof, column.tolist()))
+        sample = column[np.linspace(0, size - 1, self.OBJECT_SAMPLE_SIZE).astype(np.int64)]
+        return int(sum(map(sys.getsizeof, sample.tolist())) * size / self.OBJECT_SAMPLE_SIZE)
+
+    def to_rows(self) -> List[Dict]:
+        """Materialize selected rows as JSON-ready dicts, the only per-row pass"""
+        index = np.flatnonzero(self.selection)
+        names = list(self.columns)
+        values = {name: self.columns[name][index] for name in names}
+
+        masked_rows = []
+        if self.salary_labels is not None and 'salary' in values:
+            labels = self.salary_labels[index]
+            is_masked = np.not_equal(labels, None)
+            salary = values['salary'].astype(object)
+            salary[is_masked] = labels[is_masked]
+            values['salary'] = salary
+            masked_rows = np.flatnonzero(is_masked).tolist()
+
+        rows = [dict(zip(names, row)) for row in zip(*(values[n].tolist() for n in names))]
+        for i in masked_rows:
+            rows[i]['salary_masked'] = True
+        return rows
+
+# ============================================================================
+# WEB SEARCH BACKENDS
+# ============================================================================
+
+class WebSearchError(Exception):
+    """The search backend failed, timed out or is circuit-broken"""
+
+
+class WebSearchBackend(ABC):
+    """Interface: return [{title, url, snippet}] for an already sanitized query"""
+
+    name = 'base'
+
+    @abstractmethod
+    def search(self, query: str) -> List[Dict]:
+        ...
+
+
+class MockSearchBackend(WebSearchBackend):
+    """Canned results, no network"""
+
+    name = 'mock'
+
+    def search(self, query: str) -> List[Dict]:
+        return [
+            {
+                "title": "Senior Software Engineer Salary Guide 2024",
+                "url": "https://example.com/salary-guide",
+                "snippet": "Senior Software Engineers earn between $120k-$180k..."
+            },
+            {
+                "title": "Tech Salary Trends",
+                "url": "https://example.com/trends",
+                "snippet": "Market rates for senior engineers have increased..."
+            }
+        ]
+
+
+class HttpSearchBackend(WebSearchBackend):
+    """
+    Calls GET <url>?q=<query> and expects {"results": [...]}.
+
+    Connections are kept alive and reused from a bounded pool; a reused
+    connection the server has since closed is retried once on a fresh one.
+    """
+
+    name = 'http'
+
+    def __init__(self, url: str, timeout: float, pool_size: int):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or '/'
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        connection_class = (http.client.HTTPSConnection if self.scheme == 'https'
+                            else http.client.HTTPConnection)
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _request(self, conn, target: str) -> Tuple[http.client.HTTPResponse, bytes]:
+        conn.request('GET', target, headers={'Connection': 'keep-alive'})
+        response = conn.getresponse()
+        return response, response.read()
+
+    def search(self, query: str) -> List[Dict]:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise WebSearchError("No free search connection")
+
+        target = f"{self.path}?{urlencode({'q': query})}"
+        try:
+            try:
+                conn = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._new_connection()
+                reused = False
+
+            try:
+                response, body = self._request(conn, target)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
                 conn.close()
+                if not reused:
+                    raise
+                conn = self._new_connection()
+                response, body = self._request(conn, target)
+
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise WebSearchError(f"Search backend request failed: {e}") from e
+        finally:
+            self._slots.release()
+
+        # The body is fully read, so the connection is reusable whatever it says
+        if response.will_close:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+        if response.status != 200:
+            raise WebSearchError(f"Search backend returned HTTP {response.status}")
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise WebSearchError(f"Search backend returned invalid JSON: {e}") from e
+        results = payload.get('results') if isinstance(payload, dict) else None
+        if not isinstance(results, list):
+            raise WebSearchError("Search backend response has no results list")
+        return results
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; one trial call after cooldown"""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
                 return True
-        
-        cur.close()
-        conn.close()
-        return False
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+EMAIL_PATTERN = re.compile(r'\S+@\S+')
+
+
+def sanitize_search_query(query: str) -> str:
+    """What may leave the building: no email addresses, normalized, bounded"""
+    query = EMAIL_PATTERN.sub(' ', query.lower())
+    return ' '.join(query.split())[:256]
+
+
+class _InFlightSearch:
+    __slots__ = ('done', 'results', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class WebSearchClient:
+    """
+    TTL/LRU response cache, in-flight request coalescing and a circuit
+    breaker in front of a WebSearchBackend. All keyed on the sanitized query.
+    """
+
+    def __init__(self, backend: WebSearchBackend, cache_ttl: float, cache_size: int,
+                 breaker: CircuitBreaker, timeout: float):
+        self.backend = backend
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.breaker = breaker
+        self.timeout = timeout
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.backend_calls = 0
+
+    def search(self, query: str) -> Tuple[List[Dict], Dict]:
+        """Return (results, {"cached", "coalesced"}); raises WebSearchError"""
+        key = sanitize_search_query(query)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                return entry[1], {"cached": True, "coalesced": False}
+
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlightSearch()
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                raise WebSearchError("Timed out waiting for in-flight search")
+            if call.error is not None:
+                raise call.error
+            return call.results, {"cached": False, "coalesced": True}
+
+        try:
+            if not self.breaker.allow():
+                raise WebSearchError("Search backend circuit is open")
+
+            self.backend_calls += 1
+            try:
+                results = self.backend.search(key)
+                if not isinstance(results, list):
+                    raise WebSearchError("Search backend returned no results list")
+            except Exception as e:
+                # Any failure counts, or a half-open trial would never finish
+                self.breaker.record_failure()
+                if isinstance(e, WebSearchError):
+                    raise
+                raise WebSearchError(f"Search backend failed: {e}") from e
+            self.breaker.record_success()
+
+            with self._lock:
+                self._cache[key] = (time.monotonic() + self.cache_ttl, results)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+            call.results = results
+            return results, {"cached": False, "coalesced": False}
+        except Exception as e:
+            # Followers re-raise this; they must never see results=None
+            call.error = e if isinstance(e, WebSearchError) else WebSearchError(str(e))
+            if call.error is e:
+                raise
+            raise call.error from e
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
+
+
+def create_web_search_client(config: Dict = WEB_SEARCH_CONFIG) -> WebSearchClient:
+    if config['backend'] == 'http':
+        backend = HttpSearchBackend(config['url'], config['timeout'], config['pool_size'])
+    elif config['backend'] == 'mock':
+        backend = MockSearchBackend()
+    else:
+        raise ValueError(f"Unknown web search backend: {config['backend']}")
+
+    return WebSearchClient(
+        backend,
+        config['cache_ttl'],
+        config['cache_size'],
+        CircuitBreaker(config['breaker_threshold'], config['breaker_cooldown']),
+        config['timeout']
+    )
 
 # ============================================================================
 # TOOL SIMULATORS
@@ -342,8 +1223,8 @@ class GuardrailEngine:
 class ToolSimulator:
     """Simulate LLM tool invocations"""
     
-    def __init__(self):
-        pass
+    def __init__(self, search_client: WebSearchClient = None):
+        self.search_client = search_client or create_web_search_client()
     
     def database_query(self, query_intent: str, user: Dict) -> Dict:
         """
@@ -355,61 +1236,50 @@ class ToolSimulator:
         
         Returns:
             {
-                "data": [...],
+                "data": [...] or ColumnarResultSet,  # employee listings are columnar
                 "metadata": {...}
             }
         """
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
         # TODO: Implement query parsing and execution
         # - Parse query intent
         # - Apply RBAC filtering
         # - Execute appropriate SQL query
         # - Return results
         
-        # Trial
-        if "average" in query_intent.lower():
-            cur.execute("""
-                SELECT department, AVG(salary) as avg_salary, COUNT(*) as count
-                FROM employees
-                WHERE department = %s
-                GROUP BY department
-            """, (user['department'],))
-            rows = cur.fetchall()
-            data = [dict(r) for r in rows]
+        intent = parse_query_intent(query_intent)
 
-        else:
-        # Example: Fetch all employees (should be filtered by post-hooks)
-            # cur.execute("""
-            #     SELECT id, name, email, department, role, salary
-            #     FROM employees
-            #     ORDER BY department, salary DESC
-            # """)
+        with db_connection() as conn:
             # Trial
-            salary_threshold = extract_salary_threshold(query_intent)
-
-            if salary_threshold:
-                cur.execute("""
-                    SELECT id, name, email, department, role, salary
-                    FROM employees
-                    WHERE salary > %s
-                    ORDER BY department, salary DESC
-                """, (salary_threshold,))
+            if intent[0] == 'department_average':
+                cur = conn.cursor()
+                execute_prepared(cur, 'department_average', (user['department'],))
+                rows = cur.fetchall()
+                data = [dict(r) for r in rows]
+
             else:
-                cur.execute("""
-                    SELECT id, name, email, department, role, salary
-                    FROM employees
-                    ORDER BY department, salary DESC
-                """)
+            # Example: Fetch all employees (should be filtered by post-hooks)
+                # cur.execute("""
+                #     SELECT id, name, email, department, role, salary
+                #     FROM employees
+                #     ORDER BY department, salary DESC
+                # """)
+                # Trial
+                salary_threshold = intent[1]
+
+                # Plain tuple cursor: rows are transposed straight into columns
+                cur = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+
+                if salary_threshold:
+                    execute_prepared(cur, 'employees_above_salary', (salary_threshold,))
+                else:
+                    execute_prepared(cur, 'all_employees')
 
 
-            data = [dict(r) for r in cur.fetchall()]
+                data = ColumnarResultSet.from_cursor(cur)
         
-        # results = cur.fetchall()
+            # results = cur.fetchall()
         
-        cur.close()
-        conn.close()
+            cur.close()
         
         # Trial
         return {
@@ -422,40 +1292,275 @@ class ToolSimulator:
     
     def web_search(self, query: str, user: Dict) -> Dict:
         """
-        Simulate web search tool (should be blocked if internal data detected)
+        Web search tool (should be blocked if internal data detected)
         
-        This is a mock implementation that returns fake search results
+        Goes through the configured WebSearchClient; a failing or
+        circuit-broken backend yields no results rather than an error.
         """
-        # TODO: Implement web search simulation
-        # In real implementation, this would call external APIs
-        # For this exercise, return mock data
-        
+        metadata = {
+            "query": query,
+            "tool": "web_search",
+            "backend": self.search_client.backend.name
+        }
+
+        try:
+            results, source = self.search_client.search(query)
+            metadata.update(source)
+        except WebSearchError as e:
+            results = []
+            metadata["error"] = str(e)
+
+        metadata["count"] = len(results)
         return {
-            "data": [
-                {
-                    "title": "Senior Software Engineer Salary Guide 2024",
-                    "url": "https://example.com/salary-guide",
-                    "snippet": "Senior Software Engineers earn between $120k-$180k..."
-                },
-                {
-                    "title": "Tech Salary Trends",
-                    "url": "https://example.com/trends",
-                    "snippet": "Market rates for senior engineers have increased..."
-                }
-            ],
-            "metadata": {
-                "count": 2,
-                "query": query,
-                "tool": "web_search"
-            }
+            "data": results,
+            "metadata": metadata
         }
 
+# ============================================================================
+# ORG HIERARCHY SNAPSHOT
+# ============================================================================
+
+class OrgSnapshot:
+    """
+    Immutable in-memory copy of the reporting structure in employees.
+
+    Employees are addressed by their position in the sorted ids array. The
+    snapshot keeps a parent index array, children in CSR form, depth, and
+    Euler-tour (preorder) entry/exit times, so "is X under Y" is two
+    comparisons. Each department is a packed membership bitset. For 1M
+    employees this is roughly 32 MB of numpy arrays.
+
+    refresh() re-reads only rows whose updated_at moved and returns a new
+    snapshot; readers keep using whichever snapshot they already hold.
+    """
+
+    # Re-read rows this far behind the newest updated_at seen, to catch
+    # transactions that committed after a later-stamped one
+    REFRESH_OVERLAP = '5 minutes'
+
+    def __init__(self, ids: np.ndarray, manager_ids: np.ndarray,
+                 departments: np.ndarray, updated_at=None):
+        order = np.argsort(ids, kind='stable')
+        self.ids = ids[order].astype(np.int64)
+        self.updated_at = updated_at
+
+        n = len(self.ids)
+        parent = self.index_of(manager_ids[order])
+        parent[parent == np.arange(n)] = -1
+        self.parent = parent.astype(np.int32)
+
+        # Children in CSR form: children[offsets[v]:offsets[v + 1]]
+        has_parent = self.parent >= 0
+        counts = np.bincount(self.parent[has_parent], minlength=n)
+        self.child_offsets = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(counts, out=self.child_offsets[1:])
+        self.children = np.argsort(
+            np.where(has_parent, self.parent, n), kind='stable'
+        )[:self.child_offsets[-1]].astype(np.int32)
+
+        self._build_euler_tour(np.flatnonzero(~has_parent))
+        self._build_department_bitsets(departments[order])
+
+    def _build_euler_tour(self, roots: np.ndarray):
+        n = len(self.ids)
+        tin = [-1] * n
+        depth = [0] * n
+        children = self.children.tolist()
+        offsets = self.child_offsets.tolist()
+
+        # Iterative preorder DFS; nodes on a manager_id cycle are never reached
+        counter = 0
+        stack = roots[::-1].tolist()
+        while stack:
+            v = stack.pop()
+            tin[v] = counter
+            counter += 1
+            kids = children[offsets[v]:offsets[v + 1]]
+            for k in kids:
+                depth[k] = depth[v] + 1
+            stack.extend(reversed(kids))
+
+        self.tin = np.array(tin, dtype=np.int32)
+        self.depth = np.array(depth, dtype=np.int32)
+
+        # Subtree sizes, accumulated bottom-up one depth level at a time
+        size = np.ones(n, dtype=np.int32)
+        reached = self.tin >= 0
+        for level in range(int(self.depth.max(initial=0)), 0, -1):
+            nodes = np.flatnonzero(reached & (self.depth == level))
+            np.add.at(size, self.parent[nodes], size[nodes])
+        self.tout = np.where(reached, self.tin + size - 1, -2).astype(np.int32)
+
+    def _build_department_bitsets(self, departments: np.ndarray):
+        names, codes = np.unique(departments.astype(str), return_inverse=True)
+        self.department_names = np.array(names.tolist(), dtype=object)
+        self.department_codes = codes.astype(np.int16)
+        self.department_bitsets = {
+            name: np.packbits(codes == k) for k, name in enumerate(names.tolist())
+        }
+
+    def manager_ids(self) -> np.ndarray:
+        return np.where(self.parent >= 0, self.ids[self.parent], -1)
+
+    @classmethod
+    def load(cls) -> 'OrgSnapshot':
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+            cur.execute("SELECT id, manager_id, department, updated_at FROM employees")
+            rows = cur.fetchall()
+            cur.close()
+        return cls._from_rows(rows)
+
+    @classmethod
+    def _from_rows(cls, rows: List[Tuple]) -> 'OrgSnapshot':
+        ids, manager_ids, departments, updated = (list(c) for c in zip(*rows)) if rows else ([], [], [], [])
+        return cls(
+            np.array(ids, dtype=np.int64),
+            np.array([-1 if m is None else m for m in manager_ids], dtype=np.int64),
+            np.array(departments, dtype=object),
+            max((u for u in updated if u is not None), default=None)
+        )
+
+    def refresh(self) -> 'OrgSnapshot':
+        """Apply changed employee rows; falls back to a full load on deletes"""
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+            cur.execute("SELECT COUNT(*) FROM employees")
+            total = cur.fetchone()[0]
+            if self.updated_at is None:
+                changed = None
+            else:
+                cur.execute(f"""
+                    SELECT id, manager_id, department, updated_at FROM employees
+                    WHERE updated_at >= %s - interval '{self.REFRESH_OVERLAP}'
+                """, (self.updated_at,))
+                changed = cur.fetchall()
+            cur.close()
+
+        if changed is None:
+            return OrgSnapshot.load()
+
+        _, manager_ids, departments, updated = (list(c) for c in zip(*changed)) if changed else ([], [], [], [])
+        changed_ids = np.array([r[0] for r in changed], dtype=np.int64)
+        idx = self.index_of(changed_ids)
+        new_rows = idx < 0
+
+        if len(self.ids) + int(np.count_nonzero(new_rows)) != total:
+            # Rows were deleted; the delta cannot tell us which
+            return OrgSnapshot.load()
+
+        new_managers = np.array([-1 if m is None else m for m in manager_ids], dtype=np.int64)
+        new_departments = np.array(departments, dtype=object)
+        existing = ~new_rows
+        merged_managers = self.manager_ids()
+        merged_departments = self.department_names[self.department_codes]
+        if (not new_rows.any()
+                and np.array_equal(merged_managers[idx[existing]], new_managers[existing])
+                and np.array_equal(merged_departments[idx[existing]], new_departments[existing])):
+            return self
+
+        merged_managers[idx[existing]] = new_managers[existing]
+        merged_departments[idx[existing]] = new_departments[existing]
+
+        return OrgSnapshot(
+            np.concatenate([self.ids, changed_ids[new_rows]]),
+            np.concatenate([merged_managers, new_managers[new_rows]]),
+            np.concatenate([merged_departments, new_departments[new_rows]]),
+            max([self.updated_at] + [u for u in updated if u is not None])
+        )
+
+    def index_of(self, employee_ids) -> np.ndarray:
+        """Positions of employee ids in the snapshot, -1 where unknown"""
+        employee_ids = np.asarray(employee_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(employee_ids.shape, -1, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.ids, employee_ids), len(self.ids) - 1)
+        return np.where(self.ids[idx] == employee_ids, idx, -1)
+
+    def _position(self, employee_id) -> int:
+        if employee_id is None or not len(self.ids):
+            return -1
+        i = int(np.searchsorted(self.ids, employee_id))
+        return i if i < len(self.ids) and self.ids[i] == employee_id else -1
+
+    def is_under(self, employee_id: int, manager_id: int, max_depth: int = None) -> bool:
+        """True if employee is below manager, at most max_depth levels down"""
+        e = self._position(employee_id)
+        m = self._position(manager_id)
+        if e < 0 or m < 0 or e == m:
+            return False
+        if not self.tin[m] < self.tin[e] <= self.tout[m]:
+            return False
+        return max_depth is None or self.depth[e] - self.depth[m] <= max_depth
+
+    def subordinate_mask(self, manager_id: int, employee_ids: np.ndarray,
+                         max_depth: int = None) -> np.ndarray:
+        """Vectorized is_under over an array of employee ids"""
+        m = self._position(manager_id)
+        if m < 0:
+            return np.zeros(len(employee_ids), dtype=bool)
+
+        idx = self.index_of(employee_ids)
+        tin = self.tin[idx]
+        mask = (idx >= 0) & (tin > self.tin[m]) & (tin <= self.tout[m])
+        if max_depth is not None:
+            mask &= (self.depth[idx] - self.depth[m]) <= max_depth
+        return mask
+
+    def direct_reports(self, manager_id: int) -> np.ndarray:
+        m = self._position(manager_id)
+        if m < 0:
+            return np.empty(0, dtype=np.int64)
+        return self.ids[self.children[self.child_offsets[m]:self.child_offsets[m + 1]]]
+
+    def in_department(self, employee_id: int, department: str) -> bool:
+        bitset = self.department_bitsets.get(department)
+        e = self._position(employee_id)
+        if bitset is None or e < 0:
+            return False
+        return bool((bitset[e >> 3] >> (7 - (e & 7))) & 1)
+
+    def nbytes(self) -> int:
+        arrays = (self.ids, self.parent, self.child_offsets, self.children,
+                  self.tin, self.tout, self.depth, self.department_codes)
+        return (sum(a.nbytes for a in arrays)
+                + sum(b.nbytes for b in self.department_bitsets.values()))
+
+
+_org_snapshot = None
+_org_snapshot_lock = threading.Lock()
+
+
+def get_org_snapshot() -> OrgSnapshot:
+    """Current org snapshot, loaded on first use"""
+    global _org_snapshot
+    if _org_snapshot is None:
+        with _org_snapshot_lock:
+            if _org_snapshot is None:
+                _org_snapshot = OrgSnapshot.load()
+    return _org_snapshot
+
+
+def refresh_org_snapshot(full: bool = False):
+    global _org_snapshot
+    with _org_snapshot_lock:
+        if full or _org_snapshot is None:
+            _org_snapshot = OrgSnapshot.load()
+        else:
+            _org_snapshot = _org_snapshot.refresh()
+
 # ============================================================================
 # RBAC & PERMISSION CHECKING
 # ============================================================================
 
-def check_user_permissions(user: Dict, action: str, target_employee_id: int = None) -> bool:
-    """Check if user has permission for the requested action"""
+def check_user_permissions(user: Dict, action: str, target_employee_id: int = None,
+                           report_depth: int = 1) -> bool:
+    """
+    Check if user has permission for the requested action.
+
+    report_depth is the mask rule's config value, so view_salary agrees with
+    mask_salary_data on how far below a manager salaries are visible.
+    """
     
     # TODO: Implement comprehensive permission checking
     # - Admin: Full access
@@ -464,54 +1569,62 @@ def check_user_permissions(user: Dict, action: str, target_employee_id: int = No
     
     if user['role'] == 'admin':
         return True
-    
+
     if action == 'view_salary':
         if user['role'] == 'employee':
             # Can only view own salary
             return user.get('employee_id') == target_employee_id
         
         elif user['role'] == 'manager':
-            # Can view direct reports' salaries
-            return is_direct_report(user.get('employee_id'), target_employee_id)
+            # Can view direct reports' salaries (skip-level up to report_depth)
+            return is_direct_report(user.get('employee_id'), target_employee_id, report_depth)
     
     return False
 
-def is_direct_report(manager_id: int, employee_id: int) -> bool:
-    """Check if employee reports directly to manager"""
+def is_direct_report(manager_id: int, employee_id: int, report_depth: int = 1) -> bool:
+    """Check if employee reports to manager (report_depth > 1 allows skip-level)"""
     if not manager_id or not employee_id:
         return False
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT manager_id FROM employees WHERE id = %s
-    """, (employee_id,))
-    
-    result = cur.fetchone()
-    cur.close()
-    conn.close()
-    
-    if result:
-        return result['manager_id'] == manager_id
-    
-    return False
 
-def filter_by_department(data: List[Dict], user: Dict) -> List[Dict]:
+    return get_org_snapshot().is_under(employee_id, manager_id, report_depth)
+
+def new_pipeline_stats(rows_in: int = 0, max_risk: int = 0) -> Dict:
+    """Counters filled in by the filter/mask stages as rows pass through"""
+    return {
+        "rows_in": rows_in,
+        "rows_filtered": 0,
+        "fields_masked": 0,
+        "max_risk": max_risk
+    }
+
+def filter_by_department(data: List[Dict], user: Dict, stats: Dict = None) -> List[Dict]:
     """Filter data to only show user's department"""
     if user['role'] == 'admin':
         return data
     
     user_dept = user.get('department')
-    return [item for item in data if item.get('department') == user_dept]
+    if isinstance(data, ColumnarResultSet):
+        filtered = data.select(data.columns['department'] == user_dept)
+    else:
+        filtered = [item for item in data if item.get('department') == user_dept]
 
-def mask_salary_data(data: List[Dict], user: Dict) -> List[Dict]:
-    """Mask exact salary values with ranges"""
+    if stats is not None:
+        stats['rows_filtered'] += len(data) - len(filtered)
+
+    return filtered
+
+def mask_salary_data(data: List[Dict], user: Dict, stats: Dict = None,
+                     report_depth: int = 1) -> List[Dict]:
+    """Mask exact salary values with ranges (report_depth: None = whole subtree)"""
     # TODO: Implement salary masking
     # - Convert exact values to ranges (e.g., $145k -> $140k-$160k)
     # - Keep direct reports' exact salaries visible for managers
     
+    if isinstance(data, ColumnarResultSet):
+        return mask_salary_columns(data, user, stats, report_depth)
+
     masked_data = []
+    fields_masked = 0
     for item in data:
         masked_item = item.copy()
         
@@ -532,12 +1645,13 @@ def mask_salary_data(data: List[Dict], user: Dict) -> List[Dict]:
             # Trial 2
             if user['role'] != 'admin':
                 if user['role'] == 'manager':
-                    if not is_direct_report(user.get('employee_id'), item.get('id')):
+                    if not is_direct_report(user.get('employee_id'), item.get('id'), report_depth):
                         range_size = 20000
                         lower = (salary // range_size) * range_size
                         upper = lower + range_size
                         masked_item['salary'] = f"${int(lower/1000)}k-${int(upper/1000)}k"
                         masked_item['salary_masked'] = True
+                        fields_masked += 1
                 else:
                     # employees: always mask
                     range_size = 20000
@@ -545,54 +1659,620 @@ def mask_salary_data(data: List[Dict], user: Dict) -> List[Dict]:
                     upper = lower + range_size
                     masked_item['salary'] = f"${int(lower/1000)}k-${int(upper/1000)}k"
                     masked_item['salary_masked'] = True
+                    fields_masked += 1
         
         masked_data.append(masked_item)
+
+    if stats is not None:
+        stats['fields_masked'] += fields_masked
     
     return masked_data
 
+def mask_salary_columns(data: ColumnarResultSet, user: Dict, stats: Dict = None,
+                        report_depth: int = 1) -> ColumnarResultSet:
+    """Columnar mask_salary_data: one vectorized pass instead of per-row copies"""
+    if 'salary' not in data.columns or user['role'] == 'admin':
+        return data
+
+    if user['role'] == 'manager':
+        maskable = ~get_org_snapshot().subordinate_mask(
+            user.get('employee_id'), data.columns['id'], report_depth
+        )
+    else:
+        # employees: always mask
+        maskable = np.ones(len(data.selection), dtype=bool)
+
+    masked = ColumnarResultSet(data.columns, data.selection, data.salary_labels,
+                               data.label_bytes)
+    fields_masked = masked.mask_salaries(maskable)
+
+    if stats is not None:
+        stats['fields_masked'] += fields_masked
+
+    return masked
+
+# ============================================================================
+# QUERY RESULT CACHE
+# ============================================================================
+
+class QueryResultCache:
+    """
+    Size-bounded LRU cache of post-hook database_query results.
+
+    Keys combine the structured query intent, the caller's RBAC scope and the
+    rule-set version, so an entry can only be served back to a caller whose
+    filtering and masking would have produced exactly the same rows.
+    Entries are dropped on employees/guardrail_rules change notifications.
+    Each invalidation bumps the generation; a result computed under an older
+    generation may predate the change and is not stored.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple, value: Dict, generation: int):
+        """Store value unless the cache was invalidated since `generation`"""
+        size = sum(
+            v.nbytes() if isinstance(v, ColumnarResultSet)
+            else len(json.dumps(serialize_decimals(v), default=str))
+            for v in value.values()
+        )
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+
+            # Evict least recently used entries until we fit the budget
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def invalidate(self, table: str = None):
+        """Drop cached results"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def rbac_scope(self, user: Dict) -> Tuple:
+        """Everything about the caller that changes filtered/masked output"""
+        reports_hash = None
+        if user['role'] == 'manager':
+            # Reporting lines form a tree, so equal direct reports imply
+            # equal skip-level subtrees too
+            report_ids = np.sort(get_org_snapshot().direct_reports(user.get('employee_id')))
+            reports_hash = hashlib.sha1(report_ids.tobytes()).hexdigest()
+        return (user['role'], user.get('department'), reports_hash)
+
+
+def ruleset_version(rules: List[Dict]) -> str:
+    """Fingerprint of the active rule set (changes on toggle or edit)"""
+    fingerprint = ','.join(
+        f"{r.get('id')}:{r['rule_name']}:{r.get('updated_at')}"
+        for r in sorted(rules, key=lambda r: r['rule_name'])
+    )
+    return hashlib.sha1(fingerprint.encode()).hexdigest()
+
+
+def listen_for_table_changes(on_change):
+    """Call on_change(table) on NOTIFY from the change triggers (None = unknown)"""
+    while True:
+        conn = None
+        try:
+            conn = open_db_connection()
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {CACHE_INVALIDATION_CHANNEL}")
+
+            # Anything may have changed while we were not listening
+            on_change(None)
+
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    on_change(notify.payload)
+        except Exception as e:
+            print(f"Table change listener error: {e}; reconnecting")
+            if conn is not None:
+                try:
+                    conn.close()
+                except psycopg2.Error:
+                    pass
+            time.sleep(5)
+
+
+def start_table_change_listener(on_change) -> threading.Thread:
+    listener = threading.Thread(
+        target=listen_for_table_changes, args=(on_change,),
+        name='table-change-listener', daemon=True
+    )
+    listener.start()
+    return listener
+
+# ============================================================================
+# ADMISSION CONTROL
+# ============================================================================
+
+class TokenBucket:
+    """Two floats per key, refilled lazily on access"""
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class AdmissionController:
+    """
+    Per-user and per-role rate limits plus a global cap on concurrent tool
+    executions, with a bounded wait queue where admins go first.
+
+    Every check returns 0 when admitted, otherwise the number of seconds the
+    caller should wait before retrying.
+    """
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, limits: Dict, max_concurrency_cap: int = None):
+        self.limits = json.loads(json.dumps(limits))
+        # Above this, admitted requests would queue on DB connections instead
+        self.max_concurrency_cap = max_concurrency_cap
+        self._rate_lock = threading.Lock()
+        self._user_buckets = {}
+        self._role_buckets = {}
+        self._last_sweep = time.monotonic()
+
+        self._slots = threading.Condition()
+        self._active = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+
+    def update_limits(self, changes: Dict) -> Dict:
+        """Apply new limits at runtime; unknown keys or bad values raise ValueError"""
+        if not isinstance(changes, dict):
+            raise ValueError("Admission limits must be a JSON object")
+        unknown = set(changes) - set(self.limits)
+        if unknown:
+            raise ValueError(f"Unknown admission limits: {sorted(unknown)}")
+
+        # Convert everything before touching self.limits so a bad value changes nothing
+        converted = {}
+        for key, value in changes.items():
+            if key == 'role_limits':
+                if not isinstance(value, dict) or not all(
+                        isinstance(pair, list) and len(pair) == 2 for pair in value.values()):
+                    raise ValueError("role_limits must map each role to [rate, burst]")
+                converted[key] = {role: [float(rate), float(burst)]
+                                  for role, (rate, burst) in value.items()}
+            else:
+                converted[key] = type(self.limits[key])(value)
+        if (self.max_concurrency_cap is not None
+                and converted.get('max_concurrency', 0) > self.max_concurrency_cap):
+            raise ValueError(
+                f"max_concurrency above {self.max_concurrency_cap} needs a larger DB_POOL_MAX"
+            )
+
+        with self._rate_lock, self._slots:
+            for key, value in converted.items():
+                if key == 'role_limits':
+                    self.limits[key].update(value)
+                else:
+                    self.limits[key] = value
+            # A raised concurrency cap can admit waiters straight away
+            self._slots.notify_all()
+        return self.limits
+
+    def stats(self) -> Dict:
+        return {
+            "active": self._active,
+            "waiting": len(self._waiting),
+            "tracked_users": len(self._user_buckets)
+        }
+
+    def _take(self, buckets: Dict, key, rate: float, burst: float, now: float) -> float:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(burst, now)
+        else:
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / rate if rate > 0 else self.SWEEP_INTERVAL
+
+    def _sweep(self, now: float):
+        """Forget users whose bucket has refilled; a new bucket is identical"""
+        rate = self.limits['user_rate']
+        burst = self.limits['user_burst']
+        idle = [
+            key for key, bucket in self._user_buckets.items()
+            if bucket.tokens + (now - bucket.updated) * rate >= burst
+        ]
+        for key in idle:
+            del self._user_buckets[key]
+        self._last_sweep = now
+
+    def check_rate(self, user: Dict) -> float:
+        with self._rate_lock:
+            now = time.monotonic()
+            if now - self._last_sweep > self.SWEEP_INTERVAL:
+                self._sweep(now)
+
+            wait = self._take(self._user_buckets, user['id'],
+                              self.limits['user_rate'], self.limits['user_burst'], now)
+            if wait:
+                return wait
+
+            role_rate, role_burst = self.limits['role_limits'].get(
+                user['role'], (self.limits['user_rate'], self.limits['user_burst'])
+            )
+            wait = self._take(self._role_buckets, user['role'], role_rate, role_burst, now)
+            if wait:
+                # The request is not admitted, so give the user's token back
+                self._user_buckets[user['id']].tokens += 1
+            return wait
+
+    def acquire_slot(self, user: Dict) -> float:
+        """Wait (bounded) for a tool execution slot; pair with release_slot"""
+        with self._slots:
+            if self._active < self.limits['max_concurrency'] and not self._waiting:
+                self._active += 1
+                return 0.0
+
+            timeout = self.limits['queue_timeout']
+            if len(self._waiting) >= self.limits['max_queue']:
+                return timeout
+
+            entry = (0 if user['role'] == 'admin' else 1, next(self._sequence))
+            heapq.heappush(self._waiting, entry)
+            deadline = time.monotonic() + timeout
+
+            while not (self._waiting[0] == entry
+                       and self._active < self.limits['max_concurrency']):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._slots.notify_all()
+                    return timeout
+                self._slots.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._active += 1
+            self._slots.notify_all()
+            return 0.0
+
+    def release_slot(self):
+        with self._slots:
+            self._active -= 1
+            self._slots.notify_all()
+
+
+def shed_request(user: Dict, query: str, tools: List[str], status: int,
+                 reason: str, retry_after: float):
+    """Reject an overload/rate-limited request, still leaving an audit entry"""
+    retry_after = max(1, math.ceil(retry_after))
+    message = {
+        'rate_limited': "Rate limit exceeded",
+        'overloaded': "Agent engine is overloaded",
+        'db_busy': "Agent engine is overloaded"
+    }[reason]
+
+    # Queued, not written inline: shedding must not wait on the database
+    enqueue_audit_event(
+        user['id'],
+        user['username'],
+        query or '',
+        tools[0] if tools else 'none',
+        [],
+        'shed',
+        False,
+        True,
+        0,
+        f"{message}. Retry after {retry_after}s.",
+        {
+            'admission': {'reason': reason, 'retry_after': retry_after},
+            'tools_requested': tools
+        }
+    )
+
+    return jsonify({
+        "error": message,
+        "blocked": True,
+        "retry_after": retry_after,
+        "audit_id": None
+    }), status, {"Retry-After": str(retry_after)}
+
 # ============================================================================
 # AUDIT LOGGING
 # ============================================================================
 
+def audit_row(user_id: int, username: str, query: str, tool: str,
+              hooks: List[str], action: str, masked: bool, blocked: bool,
+              risk_score: int, summary: str, metadata: Dict) -> Tuple:
+    """Column values for one audit_log insert, with metadata size-capped"""
+    metadata_json = json.dumps(serialize_decimals(metadata), default=str)
+    if len(metadata_json) > AUDIT_METADATA_MAX_BYTES:
+        # Keep the counters and what replay needs, drop everything else
+        metadata_json = json.dumps({
+            "truncated": True,
+            "original_bytes": len(metadata_json),
+            "pipeline": metadata.get("pipeline"),
+            "tools_requested": metadata.get("tools_requested")
+        })
+
+    return (
+        user_id, username, query, tool, hooks, action,
+        masked, blocked, risk_score, summary, metadata_json
+    )
+
+
 def log_audit_event(user_id: int, username: str, query: str, tool: str, 
                    hooks: List[str], action: str, masked: bool, blocked: bool,
                    risk_score: int, summary: str, metadata: Dict) -> int:
     """Log audit event to database"""
+    row = audit_row(user_id, username, query, tool, hooks, action,
+                    masked, blocked, risk_score, summary, metadata)
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        INSERT INTO audit_log 
-        (user_id, username, query, tool_invoked, hooks_triggered, action_taken, 
-         data_masked, blocked, risk_score, response_summary, metadata)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING id
-    """, (
-        user_id, username, query, tool, hooks, action,
-        masked, blocked, risk_score, summary, json.dumps(serialize_decimals(metadata))
-    ))
+    with db_connection() as conn:
+        cur = conn.cursor()
+        execute_prepared(cur, 'insert_audit_event', row)
+        audit_id = cur.fetchone()['id']
+        conn.commit()
+        cur.close()
     
-    audit_id = cur.fetchone()['id']
+    return audit_id
+
+
+_audit_queue = queue.Queue(maxsize=SHED_AUDIT_QUEUE_SIZE)
+audit_queue_stats = {'written': 0, 'dropped': 0, 'rejected': 0}
+_audit_writer = None
+_audit_writer_lock = threading.Lock()
+
+
+def enqueue_audit_event(*args) -> bool:
+    """log_audit_event, but written later in a batch; False if the queue is full"""
+    try:
+        _audit_queue.put_nowait(audit_row(*args))
+        return True
+    except queue.Full:
+        audit_queue_stats['dropped'] += 1
+        return False
+
+
+def insert_audit_rows(conn, rows: List[Tuple]):
+    cur = conn.cursor()
+    execute_values(cur, AUDIT_INSERT_COLUMNS + " VALUES %s", rows)
     conn.commit()
-    
     cur.close()
-    conn.close()
-    
-    return audit_id
+
+
+def write_queued_audit_events():
+    """Drain the audit queue in batches over a dedicated (unpooled) connection"""
+    conn = None
+    batch = []
+    while True:
+        if not batch:
+            batch.append(_audit_queue.get())
+            while len(batch) < SHED_AUDIT_BATCH_SIZE:
+                try:
+                    batch.append(_audit_queue.get_nowait())
+                except queue.Empty:
+                    break
+        try:
+            if conn is None or conn.closed:
+                conn = open_db_connection()
+            try:
+                insert_audit_rows(conn, batch)
+                audit_queue_stats['written'] += len(batch)
+                batch = []
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                raise
+            except Exception as e:
+                # One bad row fails the whole batch: write the rest one by one
+                print(f"Audit writer error: {e}; writing {len(batch)} events singly")
+                conn.rollback()
+                while batch:
+                    try:
+                        insert_audit_rows(conn, batch[:1])
+                        audit_queue_stats['written'] += 1
+                    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                        raise
+                    except Exception as e:
+                        conn.rollback()
+                        audit_queue_stats['rejected'] += 1
+                        print(f"Audit writer rejected event: {e}")
+                    batch.pop(0)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            # Connection trouble: keep the batch and retry; new events pile up in the bounded queue
+            print(f"Audit writer error: {e}; retrying {len(batch)} events in 5s")
+            if conn is not None:
+                try:
+                    conn.close()
+                except psycopg2.Error:
+                    pass
+            conn = None
+            time.sleep(5)
+
+
+def start_audit_writer() -> threading.Thread:
+    global _audit_writer
+    with _audit_writer_lock:
+        if _audit_writer is None:
+            _audit_writer = threading.Thread(
+                target=write_queued_audit_events, name='audit-writer', daemon=True
+            )
+            _audit_writer.start()
+    return _audit_writer
+
+# ============================================================================
+# STARTUP & WARM-UP
+# ============================================================================
+
+USER_ROLES = ['admin', 'manager', 'employee']
+
+# Services are built by init_services() during warm-up, not at import time
+guardrail_engine = None
+tool_simulator = None
+query_result_cache = None
+admission_controller = None
+
+STARTUP_TIMINGS = {}
+startup_ready = threading.Event()
+_engine_started = False
+_engine_started_lock = threading.Lock()
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Time one startup phase and log it"""
+    started = time.perf_counter()
+    yield
+    STARTUP_TIMINGS[name] = round((time.perf_counter() - started) * 1000, 1)
+    print(f"[startup] {name}: {STARTUP_TIMINGS[name]} ms")
+
+
+def init_services():
+    global guardrail_engine, tool_simulator, query_result_cache, admission_controller
+    guardrail_engine = GuardrailEngine()
+    tool_simulator = ToolSimulator(create_web_search_client())
+    query_result_cache = QueryResultCache(RESULT_CACHE_MAX_BYTES)
+    admission_controller = AdmissionController(ADMISSION_LIMITS, DB_POOL_MAX - DB_POOL_HEADROOM)
+
+
+def prepare_pool_connections():
+    """Check out the connections the pool opened up front so each PREPAREs now"""
+    conns = []
+    try:
+        for _ in range(DB_POOL_MIN):
+            conns.append(get_db_connection())
+    finally:
+        for conn in conns:
+            release_db_connection(conn)
+
+
+def handle_table_change(table: str = None):
+    """Drop in-memory state derived from a changed table (None = everything)"""
+    try:
+        if table in (None, 'guardrail_rules'):
+            guardrail_engine.invalidate_rules()
+        if table in (None, 'employees'):
+            # Refresh the org snapshot first so repopulated cache entries see it
+            refresh_org_snapshot(full=table is None)
+            guardrail_engine.invalidate_employee_name_index()
+    finally:
+        # Even if the refresh failed, cached results may be stale now
+        query_result_cache.invalidate(table)
+
+
+def warm_up(start_listener: bool = True):
+    """Build services and pay every cold-start cost before reporting ready"""
+    with startup_phase('services'):
+        init_services()
+    with startup_phase('db_pool'):
+        init_db_pool()
+    with startup_phase('hot_statements'):
+        prepare_pool_connections()
+    with startup_phase('rule_sets'):
+        guardrail_engine.compile_rule_sets(USER_ROLES)
+    with startup_phase('employee_name_index'):
+        guardrail_engine.load_employee_name_index()
+    with startup_phase('org_snapshot'):
+        refresh_org_snapshot(full=True)
+    with startup_phase('audit_writer'):
+        start_audit_writer()
+    if start_listener:
+        with startup_phase('table_change_listener'):
+            start_table_change_listener(handle_table_change)
+
+    STARTUP_TIMINGS['warm_up_total'] = round(
+        sum(v for k, v in STARTUP_TIMINGS.items() if k not in ('import', 'warm_up_total')), 1
+    )
+    startup_ready.set()
+    print(f"[startup] ready after {STARTUP_TIMINGS['warm_up_total']} ms of warm-up")
+
+
+def run_warm_up():
+    """Background warm-up; on failure stay not-ready and retry"""
+    while not startup_ready.is_set():
+        try:
+            warm_up()
+        except Exception as e:
+            print(f"[startup] warm-up failed: {e}; retrying in 5s")
+            time.sleep(5)
+
+
+def start_engine():
+    """
+    Start the background warm-up for this serving process, once.
+
+    Called by the __main__ block, by wsgi.py when a WSGI server imports the
+    app, and on the first request as a fallback (e.g. `flask run`). The
+    reloader's parent process never serves requests, so it never warms up.
+    """
+    global _engine_started
+    with _engine_started_lock:
+        if _engine_started:
+            return
+        _engine_started = True
+    threading.Thread(target=run_warm_up, name='warm-up', daemon=True).start()
 
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
-guardrail_engine = GuardrailEngine()
-tool_simulator = ToolSimulator()
+@app.before_request
+def ensure_engine_started():
+    if not _engine_started:
+        start_engine()
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "service": "agent-engine"})
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: only green once warm-up has completed"""
+    if not startup_ready.is_set():
+        return jsonify({
+            "status": "warming_up",
+            "service": "agent-engine",
+            "startup": STARTUP_TIMINGS
+        }), 503
+    return jsonify({
+        "status": "ready",
+        "service": "agent-engine",
+        "startup": STARTUP_TIMINGS
+    })
+
 @app.route('/api/agent/query', methods=['POST'])
 def execute_query():
     """
@@ -616,6 +2296,10 @@ def execute_query():
             "audit_id": int
         }
     """
+    if not startup_ready.is_set():
+        return jsonify({"error": "Agent engine is warming up"}), 503, {"Retry-After": "5"}
+
+    user = None
     try:
         data = request.json
         
@@ -626,41 +2310,44 @@ def execute_query():
         # context = data.get('context', {})
         
         # Fetch user information
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        # user = dict(cur.fetchone())
-        # Trial
-        row = cur.fetchone()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            execute_prepared(cur, 'user_by_id', (user_id,))
+            # user = dict(cur.fetchone())
+            # Trial
+            row = cur.fetchone()
+
+            if row:
+                user = dict(row)
+
+                # Trial
+                if not user.get('department') and user.get('employee_id'):
+                    # Fallback: infer department from employee record
+                    # conn = get_db_connection()
+                    # cur = conn.cursor()
+                    execute_prepared(
+                        cur, 'employee_department',
+                        # (user.get('employee_id'),)
+                        (user['employee_id'],)
+                    )
+                    emp = cur.fetchone()
+                    # cur.close()
+                    # conn.close()
+
+                    if emp:
+                        user['department'] = emp['department']
+
+                # Trial ends
+            cur.close()
 
         if not row:
-            cur.close()
-            conn.close()
             return jsonify({"error": f"User {user_id} not found"}), 404
-
-        user = dict(row)
         
-        # Trial
-        if not user.get('department') and user.get('employee_id'):
-            # Fallback: infer department from employee record
-            # conn = get_db_connection()
-            # cur = conn.cursor()
-            cur.execute(
-                "SELECT department FROM employees WHERE id = %s",
-                # (user.get('employee_id'),)
-                (user['employee_id'],)
-            )
-            emp = cur.fetchone()
-            # cur.close()
-            # conn.close()
-
-            if emp:
-                user['department'] = emp['department']
+        # Per-user and per-role rate limits
+        retry_after = admission_controller.check_rate(user)
+        if retry_after:
+            return shed_request(user, query, tools, 429, 'rate_limited', retry_after)
 
-        # Trial ends
-        cur.close()
-        conn.close()
-        
         # STEP 1: Execute Pre-Hooks
         pre_result = guardrail_engine.execute_pre_hooks(query, user, tools)
         
@@ -677,7 +2364,7 @@ def execute_query():
                 True,
                 pre_result['risk_score'],
                 pre_result['reason'],
-                {'pre_hook_result': pre_result}
+                {'pre_hook_result': pre_result, 'tools_requested': tools}
             )
             
             return jsonify({
@@ -691,37 +2378,92 @@ def execute_query():
         
         # STEP 2: Execute Tool
         active_tools = [t for t in tools if t not in pre_result['tools_blocked']]
-        
+
+        rules_version, active_rules = guardrail_engine.load_rule_set(user["role"])
+        active_rule_names = {r["rule_name"] for r in active_rules if not r.get("shadow")}
+
+        # database_query results are cached per intent, RBAC scope and rule set
+        cache_key = None
+        cached = None
+        # Taken before the scope or the rows are read; a change notification
+        # arriving after this point keeps the result out of the cache
+        cache_generation = query_result_cache.generation
         if 'database_query' in active_tools:
-            tool_response = tool_simulator.database_query(query, user)
-        elif 'web_search' in active_tools:
-            tool_response = tool_simulator.web_search(query, user)
+            cache_key = (
+                parse_query_intent(query),
+                query_result_cache.rbac_scope(user),
+                rules_version
+            )
+            cached = query_result_cache.get(cache_key)
+
+        if cached is not None:
+            post_result = cached['post_result']
+            final_data = cached['final_data']
+            stats = dict(cached['stats'], max_risk=pre_result['risk_score'])
         else:
-            tool_response = {"data": [], "metadata": {}}
-        
-        # STEP 3: Execute Post-Hooks
-        post_result = guardrail_engine.execute_post_hooks(
-            tool_response['data'], 
-            user, 
-            active_tools[0] if active_tools else 'none'
-        )
-        
-        # Apply filtering and masking
-        # Trial
-        # filtered_data = filter_by_department(post_result['filtered_response'], user)
-        # masked_data = mask_salary_data(filtered_data, user)
-        active_rules = guardrail_engine.load_active_guardrails(user["role"])
-        active_rule_names = {r["rule_name"] for r in active_rules}
+            # Global concurrency cap in front of tool execution
+            retry_after = admission_controller.acquire_slot(user)
+            if retry_after:
+                return shed_request(user, query, tools, 503, 'overloaded', retry_after)
+
+            try:
+                if 'database_query' in active_tools:
+                    tool_response = tool_simulator.database_query(query, user)
+                elif 'web_search' in active_tools:
+                    tool_response = tool_simulator.web_search(query, user)
+                else:
+                    tool_response = {"data": [], "metadata": {}}
 
-        final_data = post_result["filtered_response"]
+                # STEP 3: Execute Post-Hooks
+                post_result = guardrail_engine.execute_post_hooks(
+                    tool_response['data'], 
+                    user, 
+                    active_tools[0] if active_tools else 'none'
+                )
 
-        if "filter_cross_department_access" in active_rule_names:
-            final_data = filter_by_department(final_data, user)
+                # Apply filtering and masking
+                # Trial
+                # filtered_data = filter_by_department(post_result['filtered_response'], user)
+                # masked_data = mask_salary_data(filtered_data, user)
+                final_data = post_result["filtered_response"]
+                stats = new_pipeline_stats(len(final_data), pre_result['risk_score'])
+
+                if "filter_cross_department_access" in active_rule_names:
+                    final_data = filter_by_department(final_data, user, stats)
+
+                if "mask_non_direct_report_salaries" in active_rule_names:
+                    mask_rule = next(
+                        r for r in active_rules
+                        if r["rule_name"] == "mask_non_direct_report_salaries"
+                    )
+                    final_data = mask_salary_data(
+                        final_data, user, stats,
+                        (mask_rule["config"] or {}).get("report_depth", 1)
+                    )
+
+                # Trial ends
+
+                # Only the hook summary is needed downstream, not the raw rows
+                post_result = {
+                    'hooks_triggered': post_result['hooks_triggered'],
+                    'masked_fields': post_result['masked_fields'],
+                    'shadow_hooks_triggered': post_result['shadow_hooks_triggered']
+                }
 
-        if "mask_non_direct_report_salaries" in active_rule_names:
-            final_data = mask_salary_data(final_data, user)
-        
-        # Trial ends
+                if cache_key is not None:
+                    if isinstance(final_data, ColumnarResultSet):
+                        # Hold only this scope's rows, not the unfiltered columns
+                        final_data = final_data.compact()
+                    query_result_cache.put(cache_key, {
+                        'post_result': post_result,
+                        'final_data': final_data,
+                        'stats': stats
+                    }, cache_generation)
+            finally:
+                admission_controller.release_slot()
+
+        rows_out = stats['rows_in'] - stats['rows_filtered']
+        data_masked = stats['fields_masked'] > 0
 
         # STEP 4: Log Audit Event
         audit_id = log_audit_event(
@@ -732,13 +2474,23 @@ def execute_query():
             pre_result['hooks_triggered'] + post_result['hooks_triggered'],
             'allowed_filtered',
             # len(post_result['masked_fields']) > 0,
-            any('salary' in str(x).lower() for x in final_data),
+            data_masked,
             False,
-            pre_result['risk_score'],
-            f"Query executed successfully. {len(final_data)} results returned.",
+            stats['max_risk'],
+            f"Query executed successfully. {rows_out} results returned.",
             {
-                'pre_hooks': pre_result,
+                'pre_hooks': {
+                    'hooks_triggered': pre_result['hooks_triggered'],
+                    'tools_blocked': pre_result['tools_blocked'],
+                    'risk_score': pre_result['risk_score']
+                },
                 'post_hooks': post_result,
+                'shadow': {
+                    'pre_hooks': pre_result['shadow'],
+                    'post_hooks': post_result['shadow_hooks_triggered']
+                },
+                'pipeline': stats,
+                'tools_requested': tools,
                 'tools_used': active_tools
             }
         )
@@ -749,21 +2501,53 @@ def execute_query():
             "response": safe_data,
             "hooks_triggered": pre_result['hooks_triggered'] + post_result['hooks_triggered'],
             # "data_masked": len(post_result['masked_fields']) > 0,
-            "data_masked": any('salary_masked' in r for r in safe_data if isinstance(r, dict)),
+            "data_masked": data_masked,
             "blocked": False,
             "risk_score": pre_result['risk_score'],
             "audit_id": audit_id,
             "metadata": {
-                "total_results": len(safe_data),
+                "total_results": rows_out,
+                "rows_filtered": stats['rows_filtered'],
+                "fields_masked": stats['fields_masked'],
                 "tools_used": active_tools,
                 "tools_blocked": pre_result['tools_blocked']
             }
         })
 
         
+    except DatabaseBusyError:
+        # Connections are exhausted: shed like an overload, not a 500
+        if user is None:
+            # Not looked up yet, so the client's user_id may not exist
+            user = {'id': None, 'username': None, 'role': None}
+        return shed_request(user, query, tools, 503, 'db_busy', DB_POOL_TIMEOUT)
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/admission/limits', methods=['GET', 'PUT'])
+def admission_limits():
+    """Inspect or change admission control limits at runtime"""
+    if not startup_ready.is_set():
+        return jsonify({"error": "Agent engine is warming up"}), 503, {"Retry-After": "5"}
+
+    if request.method == 'PUT':
+        try:
+            admission_controller.update_limits(request.json or {})
+        except (ValueError, TypeError) as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+    return jsonify({
+        "success": True,
+        "data": {
+            "limits": admission_controller.limits,
+            "stats": dict(
+                admission_controller.stats(),
+                audit_queue=dict(audit_queue_stats, pending=_audit_queue.qsize())
+            )
+        }
+    })
+
 @app.route('/api/test/scenarios', methods=['GET'])
 def get_test_scenarios():
     """Return test scenarios for frontend testing"""
@@ -813,21 +2597,20 @@ def toggle_guardrail(rule_id):
         data = request.json
         enabled = data.get('enabled')
 
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with db_connection() as conn:
+            cur = conn.cursor()
 
-        cur.execute("""
-            UPDATE guardrails_rules
-            SET enabled = %s
-            WHERE id = %s
-            RETURNING id, rule_name, enabled
-        """, (enabled, rule_id))
+            cur.execute("""
+                UPDATE guardrails_rules
+                SET enabled = %s
+                WHERE id = %s
+                RETURNING id, rule_name, enabled
+            """, (enabled, rule_id))
 
-        updated = cur.fetchone()
-        conn.commit()
+            updated = cur.fetchone()
+            conn.commit()
 
-        cur.close()
-        conn.close()
+            cur.close()
 
         if not updated:
             return jsonify({"error": "Guardrail not found"}), 404
@@ -845,6 +2628,8 @@ def toggle_guardrail(rule_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+STARTUP_TIMINGS['import'] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+
 # ============================================================================
 # MAIN
 # ============================================================================
@@ -856,5 +2641,11 @@ if __name__ == '__main__':
     print(f"Database: {DB_CONFIG['database']}@{DB_CONFIG['host']}")
     print("Port: 5000")
     print("=" * 60)
+    print(f"[startup] import: {STARTUP_TIMINGS['import']} ms")
+
+    debug = True
+    # Under the reloader this process only watches files; its child serves
+    if not debug or is_running_from_reloader():
+        start_engine()
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=debug, host='0.0.0.0', port=5000)
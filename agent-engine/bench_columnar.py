@@ -0,0 +1,141 @@
+"""
+AI Guardrails Control System - Columnar Pipeline Benchmark
+
+Compares the dict-per-row filter/mask pipeline with ColumnarResultSet
+(including the compact() a cached result goes through) on a synthetic
+employees result set, and checks that ColumnarResultSet.nbytes()
+(what the query result cache charges) covers the memory a compacted result
+actually holds. No database is required.
+
+Usage:
+    python bench_columnar.py [--rows 100000] [--repeat 5]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+from app import (
+    ColumnarResultSet, filter_by_department, mask_salary_data,
+    new_pipeline_stats, serialize_decimals
+)
+
+NAMES = ['id', 'name', 'email', 'department', 'role', 'salary']
+DEPARTMENTS = ['Engineering', 'Sales', 'HR', 'Finance']
+USER = {'role': 'employee', 'department': 'Engineering', 'employee_id': 4}
+
+
+def build_rows(count: int):
+    rng = random.Random(7)
+    return [
+        (i, f"Employee {i}", f"employee.{i}@company.com", rng.choice(DEPARTMENTS),
+         'Software Engineer', Decimal(rng.randrange(60000, 250000, 500)))
+        for i in range(1, count + 1)
+    ]
+
+
+def dict_pipeline(rows):
+    # fetch (RealDictRow) -> dict(r) is two materializations; count it as one
+    data = [dict(zip(NAMES, row)) for row in rows]
+    stats = new_pipeline_stats(len(data))
+    data = filter_by_department(data, USER, stats)
+    data = mask_salary_data(data, USER, stats)
+    return json.dumps(serialize_decimals(data))
+
+
+def columnar_pipeline(rows):
+    data = ColumnarResultSet.from_rows(NAMES, rows)
+    stats = new_pipeline_stats(len(data))
+    data = filter_by_department(data, USER, stats)
+    data = mask_salary_data(data, USER, stats)
+    # Cacheable queries compact (and size) the result on the request path
+    data = data.compact()
+    return json.dumps(serialize_decimals(data))
+
+
+def held_bytes(build):
+    """Memory retained by the representation right after fetch"""
+    tracemalloc.start()
+    held = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def peak_bytes(pipeline, rows):
+    tracemalloc.start()
+    pipeline(rows)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def cached_bytes(rows):
+    """(nbytes() charged, bytes traced) for a compacted, masked result"""
+    tracemalloc.start()
+    # Copy every cell the way a cursor fetch creates fresh objects per row
+    fetched = [tuple(json.loads(json.dumps(row[:5])) + [row[5]]) for row in rows]
+    data = ColumnarResultSet.from_rows(NAMES, fetched)
+    del fetched
+    data = mask_salary_data(filter_by_department(data, USER), USER).compact()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return data.nbytes(), held
+
+
+def best_ms(pipeline, rows, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pipeline(rows)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dict vs columnar filter/mask pipeline")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+
+    if dict_pipeline(rows) != columnar_pipeline(rows):
+        print("FAIL: pipelines produced different JSON")
+        return 1
+
+    results = {
+        'dict': (
+            held_bytes(lambda: [dict(zip(NAMES, row)) for row in rows]),
+            peak_bytes(dict_pipeline, rows),
+            best_ms(dict_pipeline, rows, args.repeat)
+        ),
+        'columnar': (
+            held_bytes(lambda: ColumnarResultSet.from_rows(NAMES, rows)),
+            peak_bytes(columnar_pipeline, rows),
+            best_ms(columnar_pipeline, rows, args.repeat)
+        )
+    }
+
+    print("=" * 60)
+    print(f"Rows: {args.rows}  (employee in Engineering: filter + mask)")
+    print(f"{'pipeline':10} {'held B/row':>12} {'peak MB':>10} {'latency ms':>12}")
+    for name, (held, peak, ms) in results.items():
+        print(f"{name:10} {held / args.rows:>12.1f} {peak / 2**20:>10.1f} {ms:>12.1f}")
+    charged, held = cached_bytes(rows)
+    print(f"Cached result: nbytes() {charged / 2**20:.1f} MB, traced {held / 2**20:.1f} MB")
+    print("=" * 60)
+
+    if charged < 0.9 * held:
+        print("FAIL: nbytes() under-counts cached memory")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+AI Guardrails Control System - Org Snapshot Benchmark
+
+Builds an OrgSnapshot for a synthetic org and reports its memory footprint
+and ancestry-check latency. No database is required.
+
+Usage:
+    python bench_org_snapshot.py [--employees 1000000] [--span 8] [--checks 100000]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from app import OrgSnapshot
+
+DEPARTMENTS = ['Engineering', 'Sales', 'HR', 'Finance', 'Legal', 'Support', 'Marketing', 'Ops']
+
+
+def build_org(count: int, span: int):
+    """Breadth-first tree: employee i reports to (i - 2) // span + 1"""
+    ids = np.arange(1, count + 1, dtype=np.int64)
+    managers = np.where(ids == 1, -1, (ids - 2) // span + 1)
+    departments = np.array(DEPARTMENTS, dtype=object)[ids % len(DEPARTMENTS)]
+    return ids, managers, departments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OrgSnapshot size and latency")
+    parser.add_argument('--employees', type=int, default=1000000)
+    parser.add_argument('--span', type=int, default=8)
+    parser.add_argument('--checks', type=int, default=100000)
+    args = parser.parse_args()
+
+    ids, managers, departments = build_org(args.employees, args.span)
+
+    started = time.perf_counter()
+    org = OrgSnapshot(ids, managers, departments)
+    build_s = time.perf_counter() - started
+
+    rng = random.Random(7)
+    pairs = [(rng.randint(1, args.employees), rng.randint(1, args.employees // args.span))
+             for _ in range(args.checks)]
+
+    started = time.perf_counter()
+    under = sum(org.is_under(e, m) for e, m in pairs)
+    is_under_us = (time.perf_counter() - started) * 1e6 / args.checks
+
+    batch = ids[rng.randrange(0, args.employees - 100000):][:100000]
+    started = time.perf_counter()
+    org.subordinate_mask(2, batch)
+    mask_ms = (time.perf_counter() - started) * 1000
+
+    print("=" * 60)
+    print(f"Employees: {args.employees}  Span: {args.span}  Depth: {int(org.depth.max())}")
+    print(f"Build:            {build_s:8.2f} s")
+    print(f"Snapshot size:    {org.nbytes() / 2**20:8.1f} MB")
+    print(f"is_under:         {is_under_us:8.2f} us/check ({under} of {args.checks} true)")
+    print(f"subordinate_mask: {mask_ms:8.2f} ms per 100k ids")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+AI Guardrails Control System - Risk Scoring Benchmark
+
+Measures the per-request pre-hook cost against a synthetic rule set: the
+RiskScoringEngine stages on their own, and GuardrailEngine.execute_pre_hooks
+end to end with the rules held statically. No database is required.
+
+Usage:
+    python bench_risk_scoring.py [--rules 10000] [--iterations 5000] [--budget-us 100]
+
+Exits non-zero when the median evaluate() or execute_pre_hooks() call
+exceeds the budget.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from app import GuardrailEngine, RiskScoringEngine
+
+VOCABULARY_SIZE = 500
+TOOLS = ['database_query', 'web_search', 'email_send', 'file_read', 'code_exec']
+ACTIONS = ['block', 'require_approval', 'mask', 'filter']
+
+
+def build_rules(count: int, rng: random.Random):
+    vocabulary = [f"term{i}" for i in range(VOCABULARY_SIZE)] + [
+        'salary', 'compensation', 'pay', 'wages', 'all employees', 'everyone'
+    ]
+    rules = []
+    for i in range(count):
+        rules.append({
+            "id": i,
+            "rule_name": f"rule_{i}",
+            "rule_type": "pre_hook",
+            "trigger_condition": {
+                "keywords": rng.sample(vocabulary, rng.randint(1, 5)),
+                "tools": rng.sample(TOOLS, rng.randint(0, 2))
+            },
+            "action": rng.choice(ACTIONS),
+            "config": {},
+            "priority": i,
+            "enabled": True,
+            "target_roles": ['employee', 'manager']
+        })
+    return rules
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--rules', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--budget-us', type=float, default=100.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = build_rules(args.rules, rng)
+
+    started = time.perf_counter()
+    engine = RiskScoringEngine(rules)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    queries = [
+        ("What is the average salary in Engineering?", ['database_query']),
+        ("Show me all employees making over $150k", ['database_query']),
+        ("Compare term12 and term345 pay with market rates", ['database_query', 'web_search']),
+        ("List everyone in term7", ['file_read']),
+    ]
+    features = [engine.extract_features(q, t) for q, t in queries]
+
+    guardrails = GuardrailEngine(rules=rules)
+    # No database: an empty employee name index for the web_search leakage check
+    guardrails._employee_names = frozenset()
+    user = {'role': 'employee', 'username': 'bench_employee', 'employee_id': None}
+    guardrails.compile_rule_sets(['employee'])
+
+    stages = {name: [] for name in ('extract', 'score', 'evaluate', 'pre_hooks')}
+    for i in range(args.iterations):
+        query, tools = queries[i % len(queries)]
+        keyword_cols, tool_cols = features[i % len(features)]
+
+        started = time.perf_counter_ns()
+        engine.extract_features(query, tools)
+        stages['extract'].append((time.perf_counter_ns() - started) / 1000)
+
+        started = time.perf_counter_ns()
+        engine.score(keyword_cols, tool_cols)
+        stages['score'].append((time.perf_counter_ns() - started) / 1000)
+
+        started = time.perf_counter_ns()
+        engine.evaluate(query, tools)
+        stages['evaluate'].append((time.perf_counter_ns() - started) / 1000)
+
+        started = time.perf_counter_ns()
+        guardrails.execute_pre_hooks(query, user, tools)
+        stages['pre_hooks'].append((time.perf_counter_ns() - started) / 1000)
+
+    fired = [len(engine.evaluate(q, t)["fired"]) for q, t in queries]
+
+    print("=" * 60)
+    print(f"Rules: {args.rules}  Features: {engine.matrix.shape[1]}  Iterations: {args.iterations}")
+    print(f"Compile: {compile_ms:.1f} ms  Rules fired per query: {fired}")
+    for label, name in (("Feature extraction", 'extract'), ("Scoring pass", 'score'),
+                        ("evaluate()", 'evaluate'), ("execute_pre_hooks()", 'pre_hooks')):
+        samples = stages[name]
+        print(f"{label:20s} p50 {percentile(samples, 50):8.1f} us  p99 {percentile(samples, 99):8.1f} us")
+    print("=" * 60)
+
+    failed = False
+    for label, name in (("evaluate()", 'evaluate'), ("execute_pre_hooks()", 'pre_hooks')):
+        if percentile(stages[name], 50) > args.budget_us:
+            print(f"FAIL: median {label} exceeds {args.budget_us} us budget")
+            failed = True
+    if failed:
+        return 1
+    print(f"PASS: median evaluate() and execute_pre_hooks() within {args.budget_us} us budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+AI Guardrails Control System - Web Search Client Benchmark
+
+Runs the search stand-in in-process and drives WebSearchClient against it
+to show connection reuse, request coalescing, cache hits and the circuit
+breaker. No network access or database is required.
+
+Usage:
+    python bench_web_search.py [--threads 32] [--distinct 8] [--rounds 4] [--latency-ms 50]
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import (CircuitBreaker, HttpSearchBackend, WebSearchClient, WebSearchError)
+from search_standin import create_standin_server
+
+
+def start_standin(**config):
+    server = create_standin_server(0, **config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/search"
+
+
+def make_client(url: str, args) -> WebSearchClient:
+    backend = HttpSearchBackend(url, timeout=2.0, pool_size=args.pool_size)
+    return WebSearchClient(backend, cache_ttl=60, cache_size=1000,
+                           breaker=CircuitBreaker(threshold=5, cooldown=0.5), timeout=2.0)
+
+
+def timed_search(client: WebSearchClient, query: str):
+    started = time.perf_counter()
+    try:
+        _, source = client.search(query)
+        outcome = 'cached' if source['cached'] else 'coalesced' if source['coalesced'] else 'backend'
+    except WebSearchError:
+        outcome = 'error'
+    return outcome, (time.perf_counter() - started) * 1000
+
+
+def run_burst(client: WebSearchClient, queries, threads: int):
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(lambda q: timed_search(client, q), queries))
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    latencies = sorted(ms for _, ms in results)
+    return outcomes, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Web search cache/coalescing/breaker")
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--distinct', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=4)
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    print("=" * 60)
+
+    # Healthy backend: identical in-flight queries coalesce, repeats hit the cache
+    server, url = start_standin(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 5)
+    client = make_client(url, args)
+    requests = args.threads * args.rounds
+    queries = [f"Senior Engineer Salary {i % args.distinct}" for i in range(requests)]
+    outcomes, p50, p99 = run_burst(client, queries, args.threads)
+    stats = server.stats.to_dict()
+    print(f"Healthy backend: {requests} searches, {args.distinct} distinct queries")
+    print(f"  outcomes:        {outcomes}")
+    print(f"  upstream calls:  {stats['requests']}  connections opened: {stats['connections']}")
+    print(f"  latency:         p50 {p50:.1f} ms  p99 {p99:.1f} ms")
+    server.shutdown()
+
+    # Failing backend: the breaker opens and later searches fail fast
+    server, url = start_standin(latency_ms=args.latency_ms, error_rate=1.0)
+    client = make_client(url, args)
+    queries = [f"query {i}" for i in range(requests)]
+    outcomes, p50, p99 = run_burst(client, queries, args.threads)
+    stats = server.stats.to_dict()
+    print(f"Failing backend: {requests} searches")
+    print(f"  outcomes:        {outcomes}  breaker: {client.breaker.state}")
+    print(f"  upstream calls:  {stats['requests']}")
+    print(f"  latency:         p50 {p50:.1f} ms  p99 {p99:.1f} ms")
+
+    # Backend recovers: after the cooldown one trial call closes the breaker
+    server.config['error_rate'] = 0.0
+    time.sleep(client.breaker.cooldown)
+    outcome, _ = timed_search(client, "recovered")
+    print(f"Recovery trial:  {outcome}  breaker: {client.breaker.state}")
+    server.shutdown()
+    print("=" * 60)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
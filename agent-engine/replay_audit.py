@@ -0,0 +1,264 @@
+"""
+AI Guardrails Control System - Offline Rule Replay
+
+Streams historical audit_log queries through GuardrailEngine pre-hooks with
+both the live rule set and a candidate rule set, then reports decision diffs
+and per-rule evaluation latency. Use it to gate rule changes on measured
+impact before enabling them (or before promoting shadow rules).
+
+Usage:
+    python replay_audit.py                            # candidate = shadow rules promoted
+    python replay_audit.py --candidate rules.json     # candidate = JSON list of rules
+    python replay_audit.py --workers 8 --batch-size 1000 --limit 100000
+    python replay_audit.py --max-overhead-us 50       # exit 1 if candidate is slower
+
+Only pre-hook decisions are replayed: the audit log does not keep the tool
+output that post-hooks operate on.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+
+from app import GuardrailEngine, RiskScoringEngine, open_db_connection
+
+# Per-process state, set up by init_worker
+_baseline = None
+_candidate = None
+_rule_engines = None
+_users = None
+
+
+def load_rules():
+    """All enabled rules, live and shadow"""
+    conn = open_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM guardrail_rules WHERE enabled = true ORDER BY priority ASC")
+    rules = [dict(r) for r in cur.fetchall()]
+    cur.close()
+    conn.close()
+    return rules
+
+
+def load_users():
+    conn = open_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM users")
+    users = {u['id']: dict(u) for u in cur.fetchall()}
+    cur.close()
+    conn.close()
+    return users
+
+
+def stream_audit_batches(batch_size: int, limit: int = None):
+    """Yield audit rows in batches through a server-side cursor"""
+    conn = open_db_connection()
+    cur = conn.cursor(name='replay_audit_log')
+    cur.itersize = batch_size
+
+    query = """
+        SELECT id, user_id, query, tool_invoked,
+               metadata->'tools_requested' AS tools_requested
+        FROM audit_log ORDER BY id
+    """
+    if limit:
+        query += " LIMIT %d" % limit
+    cur.execute(query)
+
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        yield [dict(r) for r in rows]
+
+    cur.close()
+    conn.close()
+
+
+def init_worker(baseline_rules, candidate_rules, users):
+    global _baseline, _candidate, _rule_engines, _users
+    _baseline = GuardrailEngine(rules=baseline_rules)
+    _candidate = GuardrailEngine(rules=candidate_rules)
+    _users = users
+
+    # One single-rule engine per candidate pre-hook, for per-rule latency
+    _rule_engines = {
+        r['rule_name']: RiskScoringEngine([r])
+        for r in candidate_rules if r['rule_type'] == 'pre_hook'
+    }
+
+
+def requested_tools(row):
+    """
+    Tools the original request asked for. tool_invoked only holds the first
+    (or, in older rows, a comma-joined list), so prefer the metadata copy.
+    """
+    if row.get('tools_requested') is not None:
+        return list(row['tools_requested'])
+    if row['tool_invoked'] in (None, 'none'):
+        return []
+    return [t.strip() for t in row['tool_invoked'].split(',') if t.strip()]
+
+
+def decision(pre_result):
+    return {
+        'allowed': pre_result['allowed'],
+        'tools_blocked': sorted(pre_result['tools_blocked']),
+        'hooks_triggered': sorted(pre_result['hooks_triggered'])
+    }
+
+
+def replay_batch(rows):
+    """Evaluate one batch with both rule sets; returns partial report"""
+    report = {
+        'rows': 0,
+        'skipped': 0,
+        'changed': 0,
+        'newly_blocked': 0,
+        'newly_allowed': 0,
+        'examples': [],
+        'baseline_us': 0.0,
+        'candidate_us': 0.0,
+        'rule_us': defaultdict(float),
+        'rule_fired': Counter()
+    }
+
+    for row in rows:
+        user = _users.get(row['user_id'])
+        if user is None or not row['query']:
+            report['skipped'] += 1
+            continue
+        tools = requested_tools(row)
+
+        started = time.perf_counter()
+        before = decision(_baseline.execute_pre_hooks(row['query'], user, tools))
+        report['baseline_us'] += (time.perf_counter() - started) * 1e6
+
+        started = time.perf_counter()
+        after = decision(_candidate.execute_pre_hooks(row['query'], user, tools))
+        report['candidate_us'] += (time.perf_counter() - started) * 1e6
+
+        for rule_name, engine in _rule_engines.items():
+            started = time.perf_counter()
+            fired = engine.evaluate(row['query'], tools)['fired']
+            report['rule_us'][rule_name] += (time.perf_counter() - started) * 1e6
+            if fired:
+                report['rule_fired'][rule_name] += 1
+
+        report['rows'] += 1
+        if before != after:
+            report['changed'] += 1
+            if before['allowed'] and not after['allowed']:
+                report['newly_blocked'] += 1
+            elif after['allowed'] and not before['allowed']:
+                report['newly_allowed'] += 1
+            if len(report['examples']) < 20:
+                report['examples'].append({
+                    'audit_id': row['id'],
+                    'query': row['query'],
+                    'baseline': before,
+                    'candidate': after
+                })
+
+    return report
+
+
+def merge(total, part):
+    for key in ('rows', 'skipped', 'changed', 'newly_blocked', 'newly_allowed',
+                'baseline_us', 'candidate_us'):
+        total[key] += part[key]
+    total['examples'].extend(part['examples'][:max(0, 20 - len(total['examples']))])
+    for name, us in part['rule_us'].items():
+        total['rule_us'][name] += us
+    total['rule_fired'].update(part['rule_fired'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay audit_log queries against a candidate rule set")
+    parser.add_argument('--candidate', help="JSON file with the candidate rule list")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--max-overhead-us', type=float,
+                        help="Fail if mean candidate cost exceeds baseline by more than this")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    all_rules = load_rules()
+    baseline_rules = [r for r in all_rules if not r.get('shadow')]
+
+    if args.candidate:
+        with open(args.candidate) as f:
+            candidate_rules = json.load(f)
+    else:
+        candidate_rules = [dict(r, shadow=False) for r in all_rules]
+
+    total = {
+        'rows': 0, 'skipped': 0, 'changed': 0, 'newly_blocked': 0, 'newly_allowed': 0,
+        'examples': [], 'baseline_us': 0.0, 'candidate_us': 0.0,
+        'rule_us': defaultdict(float), 'rule_fired': Counter()
+    }
+
+    started = time.perf_counter()
+    with Pool(args.workers, initializer=init_worker,
+              initargs=(baseline_rules, candidate_rules, load_users())) as pool:
+        for part in pool.imap_unordered(replay_batch,
+                                        stream_audit_batches(args.batch_size, args.limit)):
+            merge(total, part)
+    elapsed = time.perf_counter() - started
+
+    rows = max(total['rows'], 1)
+    baseline_mean = total['baseline_us'] / rows
+    candidate_mean = total['candidate_us'] / rows
+    report = {
+        'rows_replayed': total['rows'],
+        'rows_skipped': total['skipped'],
+        'elapsed_s': round(elapsed, 2),
+        'decisions_changed': total['changed'],
+        'newly_blocked': total['newly_blocked'],
+        'newly_allowed': total['newly_allowed'],
+        'baseline_mean_us': round(baseline_mean, 1),
+        'candidate_mean_us': round(candidate_mean, 1),
+        'per_rule': {
+            name: {
+                'fired': total['rule_fired'][name],
+                'mean_us': round(us / rows, 2)
+            }
+            for name, us in sorted(total['rule_us'].items(), key=lambda kv: -kv[1])
+        },
+        'examples': total['examples']
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print("=" * 60)
+        print(f"Replayed {report['rows_replayed']} queries in {report['elapsed_s']}s "
+              f"({report['rows_skipped']} skipped)")
+        print(f"Decisions changed: {report['decisions_changed']} "
+              f"(+{report['newly_blocked']} blocked, +{report['newly_allowed']} allowed)")
+        print(f"Pre-hook cost: baseline {baseline_mean:.1f} us, candidate {candidate_mean:.1f} us")
+        print("-" * 60)
+        print(f"{'rule':40} {'fired':>8} {'mean us':>10}")
+        for name, stats in report['per_rule'].items():
+            print(f"{name:40} {stats['fired']:>8} {stats['mean_us']:>10.2f}")
+        print("-" * 60)
+        for example in report['examples']:
+            print(f"#{example['audit_id']}: {example['query']}")
+            print(f"    baseline:  {example['baseline']}")
+            print(f"    candidate: {example['candidate']}")
+        print("=" * 60)
+
+    if args.max_overhead_us is not None and candidate_mean - baseline_mean > args.max_overhead_us:
+        print(f"FAIL: candidate overhead {candidate_mean - baseline_mean:.1f} us "
+              f"exceeds {args.max_overhead_us} us")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+AI Guardrails Control System - Local Web Search Stand-in
+
+A tiny keep-alive HTTP server that answers like the search backend the
+agent engine expects, with tunable latency and error rate, so the search
+cache, coalescing and circuit breaker can be load-tested offline.
+
+Usage:
+    python search_standin.py [--port 5050] [--latency-ms 100] [--jitter-ms 20] [--error-rate 0.0]
+
+Point the engine at it with:
+    WEB_SEARCH_BACKEND=http WEB_SEARCH_URL=http://localhost:5050/search python app.py
+
+GET /search?q=...  -> {"results": [{title, url, snippet}, ...]}
+GET /stats         -> {"requests": N, "errors": N, "connections": N}
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StandinStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def bump(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def to_dict(self):
+        return {"requests": self.requests, "errors": self.errors,
+                "connections": self.connections}
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.stats.bump('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == '/stats':
+            self._send_json(200, self.server.stats.to_dict())
+            return
+        if parts.path != '/search':
+            self._send_json(404, {"error": "not found"})
+            return
+
+        self.server.stats.bump('requests')
+        config = self.server.config
+        delay = config['latency_ms'] + random.uniform(-1, 1) * config['jitter_ms']
+        time.sleep(max(delay, 0) / 1000)
+
+        if random.random() < config['error_rate']:
+            self.server.stats.bump('errors')
+            self._send_json(503, {"error": "injected failure"})
+            return
+
+        query = parse_qs(parts.query).get('q', [''])[0]
+        self._send_json(200, {"results": [
+            {
+                "title": f"Result {i + 1} for {query}",
+                "url": f"https://example.com/search/{i + 1}",
+                "snippet": f"Stand-in result {i + 1} for '{query}'..."
+            }
+            for i in range(2)
+        ]})
+
+
+def create_standin_server(port: int = 0, latency_ms: float = 100, jitter_ms: float = 0,
+                          error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Bound but not yet serving; call serve_forever() (port 0 picks a free one)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), SearchHandler)
+    server.daemon_threads = True
+    server.stats = StandinStats()
+    server.config = {'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'error_rate': error_rate}
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local web search stand-in")
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = create_standin_server(args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"🔎 Search stand-in on http://127.0.0.1:{server.server_address[1]}/search "
+          f"(latency {args.latency_ms}±{args.jitter_ms} ms, error rate {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the engine as `app`, the same way the bench scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
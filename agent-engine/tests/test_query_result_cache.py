@@ -0,0 +1,93 @@
+"""QueryResultCache keying and invalidation; no database required"""
+
+import numpy as np
+import pytest
+
+import app
+from app import QueryResultCache
+
+
+class StubOrgSnapshot:
+    def __init__(self, reports):
+        self.reports = reports
+
+    def direct_reports(self, manager_id):
+        return np.array(self.reports.get(manager_id, []), dtype=np.int64)
+
+
+@pytest.fixture
+def org(monkeypatch):
+    snapshot = StubOrgSnapshot({1: [3, 4], 2: [5], 6: [4, 3]})
+    monkeypatch.setattr(app, 'get_org_snapshot', lambda: snapshot)
+    return snapshot
+
+
+def user(role, department='Engineering', employee_id=None):
+    return {'role': role, 'department': department, 'employee_id': employee_id}
+
+
+def entry(rows):
+    return {'final_data': rows, 'stats': {}}
+
+
+def test_scope_separates_roles_and_departments(org):
+    cache = QueryResultCache(1 << 20)
+    scopes = {
+        cache.rbac_scope(user('admin')),
+        cache.rbac_scope(user('employee')),
+        cache.rbac_scope(user('employee', 'Sales')),
+        cache.rbac_scope(user('manager', employee_id=1)),
+    }
+    assert len(scopes) == 4
+
+
+def test_scope_separates_managers_by_reports(org):
+    cache = QueryResultCache(1 << 20)
+    assert (cache.rbac_scope(user('manager', employee_id=1))
+            != cache.rbac_scope(user('manager', employee_id=2)))
+    # Same reports in any order share a scope
+    assert (cache.rbac_scope(user('manager', employee_id=1))
+            == cache.rbac_scope(user('manager', employee_id=6)))
+
+
+def test_entry_is_not_served_to_another_scope(org):
+    cache = QueryResultCache(1 << 20)
+    intent = ('employee_list', 100000)
+    alice = (intent, cache.rbac_scope(user('manager', employee_id=1)), 'v1')
+    bob = (intent, cache.rbac_scope(user('manager', employee_id=2)), 'v1')
+    peer = (intent, cache.rbac_scope(user('employee')), 'v1')
+
+    cache.put(alice, entry([{'id': 3, 'salary': 150000}]), cache.generation)
+
+    assert cache.get(alice)['final_data'] == [{'id': 3, 'salary': 150000}]
+    assert cache.get(bob) is None
+    assert cache.get(peer) is None
+    assert cache.get((intent, alice[1], 'v2')) is None
+
+
+def test_put_after_invalidate_is_dropped():
+    cache = QueryResultCache(1 << 20)
+    key = (('department_average',), ('employee', 'Sales', None), 'v1')
+
+    generation = cache.generation
+    cache.invalidate('employees')
+    cache.put(key, entry([{'avg_salary': 1}]), generation)
+    assert cache.get(key) is None
+
+    cache.put(key, entry([{'avg_salary': 2}]), cache.generation)
+    assert cache.get(key)['final_data'] == [{'avg_salary': 2}]
+
+
+def test_evicts_least_recently_used_over_budget():
+    rows = [{'name': 'x' * 100}]
+    size = len(app.json.dumps(entry(rows)['final_data']))
+    cache = QueryResultCache(2 * size + 10)
+
+    for name in ('a', 'b'):
+        cache.put(name, entry(rows), cache.generation)
+    cache.get('a')
+    cache.put('c', entry(rows), cache.generation)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.current_bytes <= cache.max_bytes
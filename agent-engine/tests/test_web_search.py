@@ -0,0 +1,94 @@
+"""WebSearchClient failure handling; stub backends, no network"""
+
+import threading
+import time
+
+import pytest
+
+from app import (CircuitBreaker, HttpSearchBackend, ToolSimulator, WebSearchBackend,
+                 WebSearchClient, WebSearchError)
+
+
+class FlakyBackend(WebSearchBackend):
+    name = 'stub'
+
+    def __init__(self, failure=None, delay=0.0):
+        self.failure = failure
+        self.delay = delay
+        self.calls = 0
+
+    def search(self, query):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.failure is not None:
+            raise self.failure
+        return [{"title": query, "url": "https://example.com", "snippet": ""}]
+
+
+class StubResponse:
+    status = 200
+    will_close = False
+
+
+def make_client(backend, threshold=1, cooldown=0.05):
+    return WebSearchClient(backend, cache_ttl=60, cache_size=10,
+                           breaker=CircuitBreaker(threshold, cooldown), timeout=1.0)
+
+
+def test_backend_without_search_cannot_be_built():
+    class NoSearch(WebSearchBackend):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        NoSearch()
+
+
+@pytest.mark.parametrize('body',[b'null', b'[1, 2]', b'{"results": null}', b'not json'])
+def test_http_backend_rejects_malformed_bodies(monkeypatch, body):
+    backend = HttpSearchBackend('http://127.0.0.1:9/search', timeout=1.0, pool_size=1)
+    monkeypatch.setattr(backend, '_request', lambda conn, target: (StubResponse(), body))
+    with pytest.raises(WebSearchError):
+        backend.search('anything')
+
+
+def test_unexpected_backend_error_is_a_web_search_error():
+    client = make_client(FlakyBackend(TypeError("'NoneType' object is not subscriptable")))
+    with pytest.raises(WebSearchError):
+        client.search('query')
+    assert client.breaker.state == 'open'
+
+
+def test_half_open_trial_failure_does_not_wedge_the_breaker():
+    backend = FlakyBackend(TypeError("boom"))
+    client = make_client(backend)
+
+    with pytest.raises(WebSearchError):
+        client.search('first')
+    time.sleep(client.breaker.cooldown)
+    with pytest.raises(WebSearchError):
+        client.search('trial')           # half-open trial fails
+    assert client.breaker.state == 'open'
+
+    backend.failure = None
+    time.sleep(client.breaker.cooldown)
+    results, _ = client.search('recovered')
+    assert results and client.breaker.state == 'closed'
+
+
+def test_coalesced_followers_get_the_error_not_none():
+    client = make_client(FlakyBackend(TypeError("boom"), delay=0.1), threshold=5)
+    tools = ToolSimulator(client)
+    outcomes = []
+
+    def search():
+        outcomes.append(tools.web_search('same query', {})['metadata'])
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert client.backend.calls == 1
+    assert len(outcomes) == 4
+    assert all(m['count'] == 0 and 'error' in m for m in outcomes)
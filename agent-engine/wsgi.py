@@ -0,0 +1,14 @@
+"""
+AI Guardrails Control System - WSGI Entry Point
+
+    gunicorn -w 4 -b 0.0.0.0:5000 wsgi:app
+
+Each worker imports this module and starts its own warm-up (DB pool,
+rule sets, name index, org snapshot, change listener). Do not use
+--preload: pooled connections and the LISTEN connection must not be
+shared across forked workers.
+"""
+
+from app import app, start_engine
+
+start_engine()
@@ -138,7 +138,8 @@ app.post('/api/guardrails', async (req, res) => {
             target_roles,
             config,
             priority,
-            enabled
+            enabled,
+            shadow
         } = req.body;
         
         // TODO: Add validation
@@ -152,8 +153,8 @@ app.post('/api/guardrails', async (req, res) => {
         const result = await pool.query(
             `INSERT INTO guardrail_rules 
             (rule_name, description, rule_type, trigger_condition, action, 
-             target_roles, config, priority, enabled)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+             target_roles, config, priority, enabled, shadow)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
             RETURNING *`,
             [
                 rule_name,
@@ -164,7 +165,8 @@ app.post('/api/guardrails', async (req, res) => {
                 target_roles || [],
                 JSON.stringify(config || {}),
                 priority || 100,
-                enabled !== false
+                enabled !== false,
+                shadow === true
             ]
         );
         
@@ -207,7 +209,8 @@ app.put('/api/guardrails/:id', async (req, res) => {
             target_roles,
             config,
             priority,
-            enabled
+            enabled,
+            shadow
         } = req.body;
         
         // TODO: Build dynamic update query
@@ -222,8 +225,9 @@ app.put('/api/guardrails/:id', async (req, res) => {
                 config = COALESCE($7, config),
                 priority = COALESCE($8, priority),
                 enabled = COALESCE($9, enabled),
+                shadow = COALESCE($10, shadow),
                 updated_at = CURRENT_TIMESTAMP
-            WHERE id = $10
+            WHERE id = $11
             RETURNING *`,
             [
                 rule_name,
@@ -235,6 +239,7 @@ app.put('/api/guardrails/:id', async (req, res) => {
                 config ? JSON.stringify(config) : null,
                 priority,
                 enabled,
+                shadow,
                 id
             ]
         );
@@ -383,10 +388,16 @@ app.post('/api/chat/query', async (req, res) => {
         console.error('Error executing query:', error.message);
         
         if (error.response) {
-            // Agent engine returned an error
+            // Agent engine returned an error; keep its load-shedding hints
+            const retryAfter = error.response.headers['retry-after'];
+            if (retryAfter) {
+                res.set('Retry-After', retryAfter);
+            }
+
             return res.status(error.response.status).json({
                 success: false,
-                error: error.response.data.error || 'Agent engine error'
+                error: error.response.data.error || 'Agent engine error',
+                audit_id: error.response.data.audit_id
             });
         }
         
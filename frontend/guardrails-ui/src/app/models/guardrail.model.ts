@@ -4,6 +4,7 @@ export interface GuardrailRule {
   rule_type: 'pre_hook' | 'post_hook';
   action: 'block' | 'mask' | 'filter' | 'require_approval';
   enabled: boolean;
+  shadow?: boolean;
   priority: number;
   target_roles: string[];
 }
\ No newline at end of file
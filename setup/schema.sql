@@ -64,6 +64,7 @@ CREATE TABLE guardrail_rules (
     target_roles TEXT[] DEFAULT '{}',
     config JSONB DEFAULT '{}',
     enabled BOOLEAN DEFAULT true,
+    shadow BOOLEAN DEFAULT false,
     priority INTEGER DEFAULT 100,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -121,6 +122,22 @@ CREATE TRIGGER update_employees_updated_at BEFORE UPDATE ON employees
 CREATE TRIGGER update_guardrails_updated_at BEFORE UPDATE ON guardrail_rules
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Function to notify the agent engine result cache of table changes
+CREATE OR REPLACE FUNCTION notify_table_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('guardrails_table_changes', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Triggers for result cache invalidation
+CREATE TRIGGER notify_employees_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON employees
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
+CREATE TRIGGER notify_guardrails_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON guardrail_rules
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
 -- ============================================================================
 -- VIEWS FOR COMMON QUERIES
 -- ============================================================================
@@ -97,7 +97,7 @@ INSERT INTO guardrail_rules (
     '{"data_fields": ["salary", "compensation"], "tools": ["database_query"]}',
     'mask',
     ARRAY['manager'],
-    '{"mask_format": "range", "range_size": 20000, "show_direct_reports": true}',
+    '{"mask_format": "range", "range_size": 20000, "show_direct_reports": true, "report_depth": 1}',
     20,
     true
 );